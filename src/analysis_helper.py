@@ -0,0 +1,205 @@
+from array import array
+from whoosh.analysis import Analyzer, Token
+
+import hashlib
+import os
+import sqlite3
+import zlib
+
+analysis_cache_file = os.path.join(os.path.dirname(__file__), '..', 'resources', 'analysis-cache.sqlite')
+analysis_cache_enabled = os.environ.get("ANALYSIS_CACHE", "1") != "0"
+
+# valores por consulta IN (...): versões antigas do sqlite aceitam no máximo 999
+sql_chunk_size = 500
+
+def select_chunked(connection, query, values):
+    """
+    Rows of a query with a single IN ({placeholders}) clause, run once per
+    chunk of sql_chunk_size values.
+    """
+    values = list(values)
+
+    for start in range(0, len(values), sql_chunk_size):
+        chunk = values[start:start + sql_chunk_size]
+        yield from connection.execute(query.format(placeholders=','.join('?' * len(chunk))), chunk)
+
+def analyzer_fingerprint(analyzer, salt=''):
+    """
+    Stable description of an analyzer chain: the class, attributes and
+    cache_version (bumped when a filter's output changes) of every component,
+    with sets sorted so the result does not depend on hash seeds.
+    """
+    parts = [salt]
+
+    for component in getattr(analyzer, 'items', [analyzer]):
+        attributes = {
+            key: sorted(value) if isinstance(value, (set, frozenset)) else value
+            for key, value in sorted(vars(component).items())
+        }
+        parts.append(f'{type(component).__qualname__}:{getattr(component, "cache_version", 0)}{attributes!r}')
+
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+class AnalysisCache:
+    """
+    Persistent token-stream cache shared by every indexer and process.
+
+    Entries are keyed by analyzer fingerprint plus content hash and hold the
+    analyzed stream as zlib-compressed term-id and position arrays; the terms
+    themselves are interned once in a vocabulary table.
+    """
+
+    def __init__(self, path=analysis_cache_file):
+        self.path = path
+        self.connection = None
+        self.pid = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'connection': None, 'pid': None}
+
+    def connect(self):
+        # conexões sqlite não sobrevivem a um fork, cada processo abre a sua
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS analyses (key TEXT PRIMARY KEY, terms BLOB NOT NULL, positions BLOB NOT NULL)')
+            self.connection.commit()
+            self.pid = os.getpid()
+            self.term_ids = {}
+            self.terms_by_id = {}
+
+        return self.connection
+
+    def remember(self, term_ids):
+        for term, term_id in term_ids.items():
+            self.term_ids[term] = term_id
+            self.terms_by_id[term_id] = term
+
+    def intern(self, terms):
+        """
+        Term ids of terms, inserting the new ones in the open transaction.
+        Also returns the ids not yet in memory, which the caller remembers
+        only once the transaction commits.
+        """
+        connection = self.connect()
+        missing = [term for term in set(terms) if term not in self.term_ids]
+        new_ids = {}
+
+        if missing:
+            connection.executemany('INSERT OR IGNORE INTO terms (term) VALUES (?)', [(term,) for term in missing])
+            new_ids = dict(select_chunked(connection, 'SELECT term, id FROM terms WHERE term IN ({placeholders})', missing))
+
+        return array('I', [new_ids[term] if term in new_ids else self.term_ids[term] for term in terms]), new_ids
+
+    def resolve(self, term_ids):
+        connection = self.connect()
+        missing = set(term_ids) - self.terms_by_id.keys()
+
+        if missing:
+            self.remember({term: term_id for term_id, term in select_chunked(connection, 'SELECT id, term FROM terms WHERE id IN ({placeholders})', missing)})
+
+        return [self.terms_by_id[term_id] for term_id in term_ids]
+
+    def get(self, key):
+        row = self.connect().execute('SELECT terms, positions FROM analyses WHERE key = ?', (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        term_ids = array('I')
+        term_ids.frombytes(zlib.decompress(row[0]))
+        positions = array('I')
+        positions.frombytes(zlib.decompress(row[1]))
+
+        return self.resolve(term_ids), positions
+
+    def put(self, key, terms, positions):
+        connection = self.connect()
+
+        with connection:
+            term_ids, new_ids = self.intern(terms)
+            connection.execute(
+                'INSERT OR REPLACE INTO analyses (key, terms, positions) VALUES (?, ?, ?)',
+                (key, zlib.compress(term_ids.tobytes()), zlib.compress(array('I', positions).tobytes()))
+            )
+
+        # só depois do commit: um rollback não deixa na memória ids que nunca foram gravados
+        self.remember(new_ids)
+
+analysis_cache = AnalysisCache()
+
+class CachedAnalyzer(Analyzer):
+    """
+    Wraps an analyzer chain so that indexing the same text with the same chain
+    is read back from the AnalysisCache instead of re-tokenized.
+
+    Only index-time analysis of whole texts goes through the cache; query
+    parsing and any call asking for character offsets reach the wrapped chain.
+    """
+
+    def __init__(self, analyzer, salt='', cache=analysis_cache):
+        self.analyzer = analyzer
+        self.fingerprint = analyzer_fingerprint(analyzer, salt)
+        self.cache = cache
+
+    def cache_key(self, text):
+        return hashlib.sha1(f'{self.fingerprint}\0{text}'.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    def analyze(self, text):
+        """
+        Return the (terms, positions) of the analyzed text, from the cache when possible.
+        """
+        if not analysis_cache_enabled:
+            tokens = [(token.text, token.pos) for token in self.analyzer(text, positions=True, mode='index')]
+            return [term for term, _ in tokens], [pos for _, pos in tokens]
+
+        key = self.cache_key(text)
+        cached = self.cache.get(key)
+
+        if cached is not None:
+            return cached
+
+        terms = []
+        positions = []
+
+        for token in self.analyzer(text, positions=True, mode='index'):
+            terms.append(token.text)
+            positions.append(token.pos)
+
+        self.cache.put(key, terms, positions)
+
+        return terms, positions
+
+    def terms(self, text):
+        return self.analyze(text)[0]
+
+    def __call__(self, value, positions=False, chars=False, keeporiginal=False, removestops=True, start_pos=0, start_char=0, mode='', **kwargs):
+        if mode != 'index' or chars or keeporiginal or not removestops or start_pos or not isinstance(value, str):
+            return self.analyzer(
+                value,
+                positions=positions,
+                chars=chars,
+                keeporiginal=keeporiginal,
+                removestops=removestops,
+                start_pos=start_pos,
+                start_char=start_char,
+                mode=mode,
+                **kwargs
+            )
+
+        return self.cached_tokens(value, positions, mode)
+
+    def cached_tokens(self, text, positions, mode):
+        terms, token_positions = self.analyze(text)
+
+        for term, pos in zip(terms, token_positions):
+            token = Token(positions=positions, mode=mode)
+            token.text = term
+            token.boost = 1.0
+            token.stopped = False
+
+            if positions:
+                token.pos = pos
+
+            yield token
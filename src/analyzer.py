@@ -1,47 +1,23 @@
+import argparse
 import json
 import nltk
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import Counter
+from functools import partial
+from itertools import islice
 
 import matplotlib
 from matplotlib import pyplot as plt
 
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-
 nltk.download('punkt')
 nltk.download('punkt_tab')
 nltk.download('stopwords')
 nltk.download('words')
 
-stop_words = set(stopwords.words('english'))
+from pool_helper import map_ordered
+from tokenizer_helper import preprocess_text, tokenizer_mode, tokenizer_modes
 
-def preprocess_text(text):
-    """
-    Preprocess text by:
-    1. Converting to lowercase
-    2. Tokenizing
-    3. Removing stopwords and non-alphabetic tokens
-    """
-    # Tokenize and convert to lowercase
-    tokens = word_tokenize(text.lower())
-    
-    # tokens = [token for token in tokens if token.isalpha() and token not in stop_words]
-    all_tokens = []
-    removed_stop_words = []
-    
-    for token in tokens:
-        if not token.isalpha():
-            continue
-        if token in stop_words:
-            removed_stop_words.append(token)
-            continue
-        all_tokens.append(token)
-    
-    return all_tokens, removed_stop_words
-
-def process_document(doc):
+def process_document(doc, mode=None):
     try:
         filepath = os.path.join(
             os.path.dirname(__file__), 
@@ -55,7 +31,7 @@ def process_document(doc):
         
         with open(filepath) as f:
             content = f.read()
-        tokens, removed_stop_words = preprocess_text(content)
+        tokens, removed_stop_words = preprocess_text(content, mode)
         return {
             'filename': doc.get('filename'),
             'tokens': tokens,
@@ -65,42 +41,71 @@ def process_document(doc):
         print(f"Erro ao processar documento: {doc.get('filename')} {e}")
         raise e
 
-def analyze_word_distribution(json_file):
+def count_documents(docs, mode=None):
+    """
+    Partial word and stopword counts of a batch of documents, computed in a
+    worker process so only the counters (not the token lists) travel back.
+    
+    Returns:
+        tuple: (word_counts, stop_word_counts, processed_documents)
+    """
+    word_counts = Counter()
+    stop_word_counts = Counter()
+    processed = 0
+    
+    for doc in docs:
+        try:
+            result = process_document(doc, mode)
+        except Exception:
+            continue
+        
+        word_counts.update(result.get('tokens'))
+        stop_word_counts.update(result.get('removed_stop_words'))
+        processed += 1
+    
+    return word_counts, stop_word_counts, processed
+
+def batched(items, size):
+    items = iter(items)
+    
+    while batch := list(islice(items, size)):
+        yield batch
+
+def analyze_word_distribution(json_file, procs=None, batch_size=16, mode=None):
     """
     Analyze word distribution in the PAN-PC-11 dataset
     
+    Documents are tokenized in batches on a process pool (word_tokenize is
+    pure Python, so threads would serialize on the GIL) and the partial
+    counters are merged as they arrive, so memory grows with the vocabulary,
+    not with the corpus.
+    
     Args:
         json_file (str): Path to the papers.json file
+        procs (int): Worker processes, all the CPUs by default
+        batch_size (int): Documents per worker task
+        mode (str): Tokenizer mode, "fast" or "compat" (same tokens as word_tokenize)
     
     Returns:
-        tuple: (total_words, vocabulary_size, word_frequencies)
+        tuple: (total_words, vocabulary_size, word_frequencies, stop_word_vocabulary_size, stop_word_frequencies)
     """
-    all_tokens = []
-    removed_stop_words = []
+    word_freq = Counter()
+    stop_word_freq = Counter()
+    total_words = 0
     
     with open(json_file, 'r', encoding='utf-8') as f:
         documents = [doc for doc in json.load(f) if doc.get('type') == 'source-document']
     
-    with ThreadPoolExecutor(max_workers=32) as executor:
-        futures = [executor.submit(process_document, doc) for doc in documents]
-        
-        for future in as_completed(futures):
-            try:
-                result = future.result()  # Obtém o resultado da tarefa
-                
-                all_tokens.extend(result.get('tokens'))
-                removed_stop_words.extend(result.get('removed_stop_words'))
-                print(f"Processed {result.get('filename')}")
-            except Exception as e:
-                print(f"Erro ao processar documento: {e}")
-                
-    word_freq = Counter(all_tokens)
-    stop_word_freq = Counter(removed_stop_words)
+    for word_counts, stop_word_counts, processed in map_ordered(partial(count_documents, mode=mode), batched(documents, batch_size), procs or os.cpu_count()):
+        word_freq.update(word_counts)
+        stop_word_freq.update(stop_word_counts)
+        total_words += sum(word_counts.values())
+        print(f"Processed {processed} documents")
     
     sorted_freq = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
     sorted_stop_freq = sorted(stop_word_freq.items(), key=lambda x: x[1], reverse=True)
     
-    return all_tokens, len(word_freq), sorted_freq, len(stop_word_freq), sorted_stop_freq
+    return total_words, len(word_freq), sorted_freq, len(stop_word_freq), sorted_stop_freq
 
 def plot_word_distribution(sorted_freq, max_words=50):
     """
@@ -125,12 +130,12 @@ def plot_word_distribution(sorted_freq, max_words=50):
     plt.tight_layout()
     plt.show()
 
-def main(json_file='/../resources/papers.json'):
+def main(json_file='/../resources/papers.json', procs=None, batch_size=16, mode=None):
     # Analyze word distribution
-    all_tokens, vocab_size, sorted_freq, stop_word_vocab_size, sorted_stop_freq = analyze_word_distribution(os.path.dirname(__file__) + json_file)
+    total_words, vocab_size, sorted_freq, stop_word_vocab_size, sorted_stop_freq = analyze_word_distribution(os.path.dirname(__file__) + json_file, procs, batch_size, mode)
     
     # Print basic statistics
-    print(f"Total number of words: {len(all_tokens)}")
+    print(f"Total number of words: {total_words}")
     print(f"Vocabulary size: {vocab_size}")
     print(f"Total number of stopwords: {stop_word_vocab_size}")
     
@@ -158,4 +163,10 @@ def main(json_file='/../resources/papers.json'):
     plot_word_distribution(sorted_stop_freq)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Distribuição de frequência das palavras dos documentos fonte")
+    parser.add_argument("--procs", type=int, help="processos que tokenizam os documentos, todos os CPUs por padrão")
+    parser.add_argument("--batch-size", type=int, default=16, help="documentos por tarefa de cada processo")
+    parser.add_argument("--tokenizer", choices=tokenizer_modes, default=tokenizer_mode, help="fast: regex de letras; compat: mesmos tokens do word_tokenize do nltk")
+    args = parser.parse_args()
+    
+    main(procs=args.procs, batch_size=args.batch_size, mode=args.tokenizer)
\ No newline at end of file
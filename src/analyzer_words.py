@@ -1,162 +1,207 @@
+import argparse
 import json
 import nltk
 import os
 
+from collections import Counter
 from matplotlib import pyplot as plt
 
-from nltk.probability import FreqDist
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-
 nltk.download('punkt')
 nltk.download('punkt_tab')
 nltk.download('stopwords')
 nltk.download('words')
 
-stop_words = set(stopwords.words('english'))
-
-def preprocess_text(text):
-    """
-    Preprocess text by:
-    1. Converting to lowercase
-    2. Tokenizing
-    3. Removing stopwords and non-alphabetic tokens
-    """
-    # Tokenize and convert to lowercase
-    tokens = word_tokenize(text.lower())
-    
-    # tokens = [token for token in tokens if token.isalpha() and token not in stop_words]
-    all_tokens = []
-    removed_stop_words = []
-    
-    for token in tokens:
-        if not token.isalpha():
-            continue
-        if token in stop_words:
-            removed_stop_words.append(token)
-            continue
-        all_tokens.append(token)
-    
-    return all_tokens, removed_stop_words
+from counting_helper import DistinctSampler, SpillingCounter
+from tokenizer_helper import preprocess_many, tokenizer_mode, tokenizer_modes
+from zipf_helper import frequency_stats, write_rank_frequency_csv, write_stats_json
 
-def process_document(doc):
-    try:
-        filepath = os.path.join(
-            os.path.dirname(__file__), 
-            '..', 
-            'resources', 
-            doc.get('type'), 
-            doc.get('filename')
-        )
-        
-        print(f"Processing {filepath}")
-        
-        with open(filepath) as f:
-            content = f.read()
-        tokens, removed_stop_words = preprocess_text(content)
-        return {
-            'filename': doc.get('filename'),
-            'tokens': tokens,
-            'removed_stop_words': removed_stop_words
-        }
-    except Exception as e:
-        print(f"Erro ao processar documento: {doc.get('filename')} {e}")
-        raise e
+def read_document(doc):
+    filepath = os.path.join(
+        os.path.dirname(__file__), 
+        '..', 
+        'resources', 
+        doc.get('type'), 
+        doc.get('filename')
+    )
+    
+    print(f"Processing {filepath}")
+    
+    with open(filepath) as f:
+        return f.read()
 
-def analyze_word_distribution(json_file):
+def analyze_word_distribution(json_file, max_documents=None, procs=1, max_terms=1_000_000, spill_dir=None, mode=None):
     """
     Analyze word distribution in the PAN-PC-11 dataset
     
+    The counts of each document go into SpillingCounters, which spill sorted
+    partial counts to disk and merge them at the end, so the whole source set
+    is counted in bounded memory.
+    
     Args:
         json_file (str): Path to the papers.json file
+        max_documents (int): Only count the first source documents
+        procs (int): Worker processes that tokenize the documents
+        max_terms (int): Distinct terms each counter keeps in memory before spilling
+        spill_dir (str): Directory of the spilled runs, the system temp dir by default
+        mode (str): Tokenizer mode, "fast" or "compat" (same tokens as word_tokenize)
     
     Returns:
-        tuple: (total_words, vocabulary_size, word_frequencies)
+        tuple: (word_counter, stop_word_counter, growth, vocabulary), growth
+        being the (words, distinct words) curve after each document and
+        vocabulary the DistinctSampler that tracked it
     """
-    all_tokens = []
-    removed_stop_words = []
+    word_freq = SpillingCounter(max_terms, spill_dir)
+    stop_word_freq = SpillingCounter(max_terms, spill_dir)
+    # as contagens vão para o disco, então o vocabulário da curva de Heaps é acompanhado à parte
+    vocabulary = DistinctSampler()
+    growth = ([], [])
     
     with open(json_file, 'r', encoding='utf-8') as f:
-        documents = [doc for doc in json.load(f) if doc.get('type') == 'source-document'][:500]
-    
-    for doc in documents:
-        result = process_document(doc)
-        
-        all_tokens.extend(result.get('tokens'))
-        removed_stop_words.extend(result.get('removed_stop_words'))
-        print(f"Processed {result.get('filename')}")
+        documents = [doc for doc in json.load(f) if doc.get('type') == 'source-document'][:max_documents]
+    
+    # os textos são lidos aqui e tokenizados em lotes no pool de processos
+    for doc, (tokens, removed_stop_words) in zip(documents, preprocess_many(map(read_document, documents), procs, mode)):
+        counts = Counter(tokens)
+        word_freq.update(counts)
+        stop_word_freq.update(Counter(removed_stop_words))
+        vocabulary.add(counts)
+        print(f"Processed {doc.get('filename')}")
         
-        del result
-        del doc
-                
-    word_freq = FreqDist(all_tokens)
-    stop_word_freq = FreqDist(removed_stop_words)
+        growth[0].append(word_freq.total)
+        growth[1].append(len(vocabulary))
     
-    return all_tokens, len(word_freq), word_freq, len(stop_word_freq), stop_word_freq
+    return word_freq, stop_word_freq, growth, vocabulary
 
-def plot_word_distribution(sorted_freq, max_words=50):
+def plot_word_distribution(most_common, max_words=50):
     """
-    Create a log-log plot of word distribution
+    Create a plot of the most frequent words
     
     Args:
-        sorted_freq (list): List of (word, frequency) tuples sorted by frequency
+        most_common (list): List of (word, frequency) tuples sorted by frequency
     """
     
-    p = sorted_freq.plot(max_words,show=False,title=f'Distribuição das {max_words} palavras mais frequentes no corpus')
-    p.set_xlabel("Amostra")
-    p.set_ylabel("Frequência")
+    if not most_common:
+        return
+    
+    words, frequencies = zip(*most_common[:max_words])
+    
+    plt.figure(figsize=(10, 6))
+    plt.plot(frequencies)
+    plt.xticks(range(len(words)), words, rotation=90)
+    plt.grid(True, color="silver")
+    plt.title(f'Distribuição das {len(words)} palavras mais frequentes no corpus')
+    plt.xlabel("Amostra")
+    plt.ylabel("Frequência")
+    plt.tight_layout()
     plt.show()
     
-def plot_word_distribution_loglog(sorted_freq, max_words=10000):
+def plot_word_distribution_loglog(stats):
     """
     Create a log-log plot of word distribution
     
     Args:
-        sorted_freq (list): List of (word, frequency) tuples sorted by frequency
+        stats (dict): frequency_stats of the corpus, whose rank-frequency curve
+            is already log-spaced, with the fitted Zipf line
     """
     
-    p = sorted_freq.plot(max_words, show=False, title=f'Distribuição das {max_words} palavras mais frequentes no corpus (log-log)')
-    p.set_xscale('log')
-    p.set_yscale('log')
-    p.set_xlabel("Amostra")
-    p.set_ylabel("Frequência")
+    ranks = stats["rank_frequency"]["ranks"]
+    
+    if not ranks:
+        return
+    
+    plt.figure(figsize=(10, 6))
+    plt.plot(ranks, stats["rank_frequency"]["frequencies"], label="Corpus")
+    
+    if stats["zipf"]:
+        fitted = [stats["zipf"]["constant"] / rank ** stats["zipf"]["exponent"] for rank in ranks]
+        plt.plot(ranks, fitted, linestyle="--", label=f'Zipf (s = {stats["zipf"]["exponent"]:.3f})')
+    
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.grid(True, color="silver")
+    plt.legend()
+    plt.title(f'Distribuição das {stats["vocabulary_size"]} palavras do corpus (log-log)')
+    plt.xlabel("Posto")
+    plt.ylabel("Frequência")
     plt.show()
 
-def main(json_file='/../resources/papers.json'):
+def main(json_file='/../resources/papers.json', max_documents=None, procs=1, max_terms=1_000_000, spill_dir=None, plot=True, output_json=None, output_csv=None, mode=None):
     # Analyze word distribution
-    all_tokens, vocab_size, sorted_freq, stop_word_vocab_size, sorted_stop_freq = analyze_word_distribution(os.path.dirname(__file__) + json_file)
+    word_freq, stop_word_freq, growth, vocabulary = analyze_word_distribution(os.path.dirname(__file__) + json_file, max_documents, procs, max_terms, spill_dir, mode)
     
+    with word_freq, stop_word_freq:
+        # uma passada pelos termos, sem montar a lista do vocabulário
+        stats = frequency_stats(word_freq.items(), n=50, growth=growth)
+        
+        if stats["heaps"]:
+            stats["heaps"]["vocabulary_estimated"] = not vocabulary.exact
+        stop_stats = frequency_stats(stop_word_freq.items(), n=50)
     
     # Print basic statistics
-    print(f"Total number of words: {len(all_tokens)}")
-    print(f"Vocabulary size: {vocab_size}")
-    print(f"Total number of stopwords: {stop_word_vocab_size}")
+    print(f"Total number of words: {stats['total']}")
+    print(f"Vocabulary size: {stats['vocabulary_size']}")
+    print(f"Total number of stopwords: {stop_stats['vocabulary_size']}")
+    
+    if stats["zipf"]:
+        print(f"Zipf: s = {stats['zipf']['exponent']:.4f} (R² = {stats['zipf']['r2']:.4f})")
+    
+    if stats["heaps"]:
+        estimated = ", vocabulário estimado por amostragem" if stats["heaps"]["vocabulary_estimated"] else ""
+        print(f"Heaps: K = {stats['heaps']['constant']:.4f}, beta = {stats['heaps']['exponent']:.4f} (R² = {stats['heaps']['r2']:.4f}, {stats['heaps']['documents']} documentos{estimated})")
     
     print("\nTop 30 most frequent words:")
-    for word, freq in sorted_freq.most_common(30):
+    for word, freq in stats["most_common"][:30]:
         print(f"{word}: {freq}")
         
     print("\nTop 30 most frequent stopwords:")
-    for word, freq in sorted_stop_freq.most_common(30):
+    for word, freq in stop_stats["most_common"][:30]:
         print(f"{word}: {freq}")
     
-    sorted_desc_freq = sorted(sorted_freq.items(), key=lambda x: x[1], reverse=True)
-    sorted_desc_stop_freq = sorted(sorted_stop_freq.items(), key=lambda x: x[1], reverse=True)
-    
     print("\nBottom 30 least frequent words:")
-    for word, freq in sorted_desc_freq[-30:]:
+    for word, freq in stats["least_common"][-30:]:
         print(f"{word}: {freq}")
     
     print("\nBottom 30 least frequent stopwords:")
-    for word, freq in sorted_desc_stop_freq[-30:]:
+    for word, freq in stop_stats["least_common"][-30:]:
         print(f"{word}: {freq}")
     
+    if output_json:
+        write_stats_json(output_json, {"words": stats, "stopwords": stop_stats})
+        print(f"\nEstatísticas salvas em {output_json}")
+    
+    if output_csv:
+        write_rank_frequency_csv(output_csv, stats)
+        print(f"Curva posto-frequência salva em {output_csv}")
+    
+    if not plot:
+        return
+    
     # Plot word distribution
-    plot_word_distribution(sorted_freq)
-    plot_word_distribution(sorted_stop_freq)
+    plot_word_distribution(stats["most_common"])
+    plot_word_distribution(stop_stats["most_common"])
     
-    plot_word_distribution_loglog(sorted_freq)
-    plot_word_distribution_loglog(sorted_stop_freq)
+    plot_word_distribution_loglog(stats)
+    plot_word_distribution_loglog(stop_stats)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Distribuição de frequência das palavras de todos os documentos fonte, em memória limitada")
+    parser.add_argument("--max-documents", type=int, help="conta só os primeiros documentos fonte")
+    parser.add_argument("--procs", type=int, default=1, help="processos que tokenizam os documentos")
+    parser.add_argument("--max-terms", type=int, default=1_000_000, help="termos distintos em memória antes de gravar uma contagem parcial em disco")
+    parser.add_argument("--spill-dir", help="pasta das contagens parciais, a pasta temporária do sistema por padrão")
+    parser.add_argument("--tokenizer", choices=tokenizer_modes, default=tokenizer_mode, help="fast: regex de letras; compat: mesmos tokens do word_tokenize do nltk")
+    parser.add_argument("--no-plot", action="store_true", help="não abre os gráficos, para execuções sem interface")
+    parser.add_argument("--json", help="salva as estatísticas e os ajustes de Zipf e Heaps em JSON")
+    parser.add_argument("--csv", help="salva a curva posto-frequência (amostrada em escala log) em CSV")
+    args = parser.parse_args()
+    
+    main(
+        max_documents=args.max_documents,
+        procs=args.procs,
+        max_terms=args.max_terms,
+        spill_dir=args.spill_dir,
+        plot=not args.no_plot,
+        output_json=args.json,
+        output_csv=args.csv,
+        mode=args.tokenizer
+    )
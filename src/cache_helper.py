@@ -0,0 +1,195 @@
+from collections import OrderedDict
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+query_cache_size = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+query_cache_ttl = float(os.environ.get("QUERY_CACHE_TTL", "300"))
+# camada persistente opcional, desligada por padrão
+query_cache_file = os.environ.get("QUERY_CACHE_FILE") or None
+
+def normalize_query(query):
+    return " ".join(str(query).lower().split())
+
+def cache_key(*parts):
+    """
+    Stable key for a search: engine, index, normalized query, fields, scoring
+    and anything else that changes its results.
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def whoosh_index_version(ix):
+    return f"whoosh:{ix.latest_generation()}"
+
+def es_index_version(es, index_name):
+    """
+    Uuids of the indices behind index_name, which change when the alias is
+    swapped to a freshly loaded index or the index is recreated.
+    """
+    settings = es.indices.get_settings(index=index_name, name="index.uuid")
+
+    return "es:" + ",".join(sorted(
+        f"{name}:{value.get('settings', {}).get('index', {}).get('uuid', '')}"
+        for name, value in settings.items()
+    ))
+
+class VersionCheck:
+    """
+    Call a (possibly slow) index version function at most once every interval
+    seconds, returning the last value in between.
+    """
+
+    def __init__(self, function, interval=1.0):
+        self.function = function
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.value = None
+        self.checked_at = None
+
+    def __call__(self):
+        with self.lock:
+            now = time.monotonic()
+
+            if self.checked_at is None or now - self.checked_at >= self.interval:
+                self.value = self.function()
+                self.checked_at = now
+
+            return self.value
+
+class QueryResultCache:
+    """
+    Search results cache with LRU and TTL eviction.
+
+    Entries are stored with the index version they were computed against and
+    a lookup with a different version is a miss, so a reindex invalidates
+    them. With path, results are also kept in a sqlite file that survives
+    the process (only the version invalidates those, not the TTL), so a
+    rerun of an evaluation only searches the queries that changed.
+    Persisted results must be JSON-serializable.
+    """
+
+    def __init__(self, max_entries=query_cache_size, ttl=query_cache_ttl, path=query_cache_file):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(entries=OrderedDict(), lock=None, connection=None, pid=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def connect(self):
+        # uma conexão por processo, compartilhada pelas threads sob self.lock
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, version TEXT NOT NULL, value BLOB NOT NULL)')
+            self.connection.commit()
+            self.pid = os.getpid()
+
+        return self.connection
+
+    def get(self, key, version):
+        """
+        Return (True, results) for a valid entry, (False, None) otherwise.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                entry_version, created, value = entry
+
+                if entry_version != version:
+                    self.invalidations += 1
+                    del self.entries[key]
+                elif self.ttl and time.monotonic() - created > self.ttl:
+                    self.expirations += 1
+                    del self.entries[key]
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+
+            if self.path:
+                row = self.connect().execute('SELECT version, value FROM results WHERE key = ?', (key,)).fetchone()
+
+                if row is not None and row[0] == version:
+                    value = json.loads(zlib.decompress(row[1]))
+                    self.store(key, version, value)
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return True, value
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key, version, value):
+        with self.lock:
+            self.store(key, version, value)
+
+            if self.path:
+                connection = self.connect()
+
+                with connection:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO results (key, version, value) VALUES (?, ?, ?)',
+                        (key, version, zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8')))
+                    )
+
+    def store(self, key, version, value):
+        self.entries[key] = (version, time.monotonic(), value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_or_compute(self, key, version, compute):
+        """
+        Cached results for key at version, computing and storing them on a
+        miss. Returns (results, whether they came from the cache).
+        """
+        found, value = self.get(key, version)
+
+        if found:
+            return value, True
+
+        value = compute()
+        self.put(key, version, value)
+
+        return value, False
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "persistent_hits": self.persistent_hits,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations
+            }
@@ -0,0 +1,147 @@
+from array import array
+from itertools import groupby
+from operator import itemgetter
+
+import hashlib
+import heapq
+import os
+import shutil
+import tempfile
+
+class SpillingCounter:
+    """
+    Term counter for corpora whose vocabulary does not fit in memory.
+
+    Terms are interned to integer ids and counted in an array indexed by id.
+    Once max_terms distinct terms are held, the run is sorted by term and
+    spilled to a file in spill_dir, and counting starts over; items() then
+    k-way merges the runs, summing the counts of each term. Memory is bounded
+    by max_terms, not by the corpus or its vocabulary.
+    """
+
+    def __init__(self, max_terms=1_000_000, spill_dir=None):
+        self.max_terms = max_terms
+        self.spill_dir = spill_dir
+        self.directory = None
+        self.runs = []
+        self.total = 0
+        self.reset()
+
+    def reset(self):
+        self.term_ids = {}
+        self.terms = []
+        self.counts = array('Q')
+
+    def add(self, terms):
+        for term in terms:
+            self.add_count(term, 1)
+
+    def update(self, counts):
+        """
+        Add the counts of a mapping of term to count (e.g. a Counter).
+        """
+        for term, count in counts.items():
+            self.add_count(term, count)
+
+    def add_count(self, term, count):
+        term_id = self.term_ids.get(term)
+
+        if term_id is None:
+            if len(self.terms) >= self.max_terms:
+                self.spill()
+
+            term_id = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+            self.counts.append(0)
+
+        self.counts[term_id] += count
+        self.total += count
+
+    def spill(self):
+        if not self.terms:
+            return
+
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='word-counts-', dir=self.spill_dir)
+
+        path = os.path.join(self.directory, f'run-{len(self.runs):05d}.tsv')
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(f'{self.terms[term_id]}\t{self.counts[term_id]}\n' for term_id in sorted(range(len(self.terms)), key=self.terms.__getitem__))
+
+        self.runs.append(path)
+        self.reset()
+
+    def sorted_run(self):
+        return ((self.terms[term_id], self.counts[term_id]) for term_id in sorted(range(len(self.terms)), key=self.terms.__getitem__))
+
+    def items(self):
+        """
+        Yield (term, count) for every distinct term, in term order.
+        """
+        if not self.runs:
+            yield from self.sorted_run()
+            return
+
+        self.spill()
+
+        for term, group in groupby(heapq.merge(*(read_run(path) for path in self.runs), key=itemgetter(0)), key=itemgetter(0)):
+            yield term, sum(count for _, count in group)
+
+    def __len__(self):
+        """
+        Distinct terms, which costs a merge of the runs when there are any.
+        """
+        return len(self.terms) if not self.runs else sum(1 for _ in self.items())
+
+    def close(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+        self.runs = []
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class DistinctSampler:
+    """
+    Number of distinct terms seen so far, in bounded memory (adaptive
+    sampling). Only the terms whose 64-bit hash is below a threshold are
+    kept; whenever more than max_size are kept the threshold halves and the
+    terms above it are dropped. The count is the kept terms scaled by the
+    sampling rate, exact until the first halving.
+    """
+
+    def __init__(self, max_size=1 << 16):
+        self.max_size = max_size
+        self.level = 0
+        self.hashes = set()
+
+    def add(self, terms):
+        for term in terms:
+            term_hash = int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'big')
+
+            if term_hash >> (64 - self.level) == 0:
+                self.hashes.add(term_hash)
+
+        while len(self.hashes) > self.max_size:
+            self.level += 1
+            self.hashes = {term_hash for term_hash in self.hashes if term_hash >> (64 - self.level) == 0}
+
+    @property
+    def exact(self):
+        return self.level == 0
+
+    def __len__(self):
+        return len(self.hashes) << self.level
+
+def read_run(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            term, count = line.rstrip('\n').rsplit('\t', 1)
+            yield term, int(count)
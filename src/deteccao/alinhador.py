@@ -0,0 +1,138 @@
+from analyzer import cached_analyzer, char_tokens, minhash_index_address, winnowing_index_address
+from evaluation_helper import latency_summary, write_report
+from file_helper import get_document_store, get_suspicious_documents
+from minhash_helper import MinHasher, MinHashIndex, segment_shingles
+from pool_helper import map_ordered
+from winnowing_helper import FingerprintIndex, extend_seeds, fingerprint
+
+from functools import partial
+
+import argparse
+import os
+import sys
+import time
+
+index = None
+candidate_index = None
+candidate_hasher = None
+source_docnums = None
+
+def get_index():
+    global index
+
+    if index is None:
+        index = FingerprintIndex(winnowing_index_address)
+
+    return index
+
+def get_candidate_index():
+    global candidate_index, candidate_hasher
+
+    if candidate_index is None:
+        candidate_index = MinHashIndex(minhash_index_address)
+        # as permutações só dependem de num_perm e seed, então o hasher é montado uma vez com o índice
+        candidate_hasher = MinHasher(candidate_index.meta["num_perm"], candidate_index.meta["seed"])
+
+    return candidate_index, candidate_hasher
+
+def get_source_docnums():
+    """
+    Document numbers of each source filename in the fingerprint index.
+    """
+    global source_docnums
+
+    if source_docnums is None:
+        source_docnums = {}
+
+        for docnum, document in enumerate(get_index().documents):
+            source_docnums.setdefault(document['filename'], []).append(docnum)
+
+    return source_docnums
+
+def candidate_documents(doc, candidates):
+    """
+    Document numbers, in the fingerprint index, of the best candidate sources
+    of the MinHash index, looked up in its LSH bands.
+    """
+    minhash_index, hasher = get_candidate_index()
+    meta = minhash_index.meta
+    shingle_sets = segment_shingles(cached_analyzer.terms(doc['content']), meta["segment_size"], meta["shingle_size"])
+    results, _ = minhash_index.search_many(hasher.sign_many(shingle_sets), [0] * len(shingle_sets), 1, candidates)
+    filenames = {minhash_index.document(docnum)['filename'] for docnum, _ in results[0]}
+    docnums = get_source_docnums()
+
+    return sorted(docnum for filename in filenames for docnum in docnums.get(filename, []))
+
+def align(doc, candidates=0, max_gap=8, min_seeds=2, max_postings=64):
+    ix = get_index()
+
+    start_time = time.perf_counter()
+    documents = candidate_documents(doc, candidates) if candidates else None
+    hashes, fingerprints = fingerprint(char_tokens(doc['content']), ix.meta["kgram_size"], ix.meta["window"])
+    seeds, postings = ix.join(hashes, fingerprints, documents, max_postings)
+    passages = extend_seeds(seeds, postings, max_gap, min_seeds)
+    elapsed = time.perf_counter() - start_time
+
+    return [
+        {
+            "source": ix.document(docnum)['filename'],
+            "this_offset": start,
+            "this_length": end - start,
+            "source_offset": source_start,
+            "source_length": source_end - source_start,
+            "seeds": seeds_count
+        }
+        for docnum, start, end, source_start, source_end, seeds_count in passages
+    ], elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Encontra os trechos reutilizados de cada documento suspeito, com as posições no suspeito e na fonte")
+    parser.add_argument("--procs", type=int, default=1, help="processos que fazem a junção com o índice, que é compartilhado por memory map")
+    parser.add_argument("--candidates", type=int, default=0, help="alinha só com as melhores fontes candidatas do índice MinHash (0 alinha com todas)")
+    parser.add_argument("--max-gap", type=int, default=8, help="distância máxima, em n-gramas, entre sementes do mesmo trecho")
+    parser.add_argument("--min-seeds", type=int, default=2, help="sementes mínimas de um trecho")
+    parser.add_argument("--max-postings", type=int, default=64, help="ignora hashes mais frequentes que isso em um shard")
+    parser.add_argument("--max-queries", type=int, help="alinha só os primeiros documentos suspeitos")
+    parser.add_argument("--validate-corpus", action="store_true", help="confere o tamanho e a data de cada arquivo do corpus com o manifesto antes de começar")
+    parser.add_argument("--output", default="alinhamento.json", help="arquivo com os trechos e o relatório")
+    args = parser.parse_args()
+
+    if not os.path.exists(winnowing_index_address) or (args.candidates and not os.path.exists(minhash_index_address)):
+        print("Índice não encontrado, execute o winnowing_indexador.py (e o minhash_indexador.py, com --candidates) primeiro")
+        sys.exit(1)
+
+    # só leitura: o manifesto do corpus é carregado sem conferir cada arquivo, a não ser com --validate-corpus
+    get_document_store(validate=args.validate_corpus)
+
+    suspicious_documents = list(get_suspicious_documents())[:args.max_queries]
+
+    print(f"Alinhando {len(suspicious_documents)} documentos suspeitos, aguarde...")
+
+    start_time = time.perf_counter()
+    aligned = partial(align, candidates=args.candidates, max_gap=args.max_gap, min_seeds=args.min_seeds, max_postings=args.max_postings)
+    results = list(map_ordered(aligned, suspicious_documents, args.procs))
+    elapsed = time.perf_counter() - start_time
+
+    # no nível de documento: as fontes com algum trecho alinhado contra as do gabarito
+    evaluated = [(doc, {passage['source'] for passage in passages}) for doc, (passages, _) in zip(suspicious_documents, results) if doc.get('src_file')]
+    found = sum(len(sources & set(doc['src_file'])) for doc, sources in evaluated)
+    detected = sum(len(sources) for _, sources in evaluated)
+    relevant = sum(len(set(doc['src_file'])) for doc, _ in evaluated)
+
+    report = {
+        "engine": "winnowing",
+        "index": winnowing_index_address,
+        "candidates": args.candidates,
+        "passages": sum(len(passages) for passages, _ in results),
+        "source_precision": found / detected if detected else 0.0,
+        "source_recall": found / relevant if relevant else 0.0,
+        **latency_summary([latency for _, latency in results], elapsed),
+        "detections": {doc['filename']: passages for doc, (passages, _) in zip(suspicious_documents, results)}
+    }
+
+    write_report(args.output, report)
+
+    print(f"Documentos por segundo: {report.get('queries_per_second') or 0:.2f}")
+    print(f"Trechos encontrados: {report['passages']}")
+    print(f"Precisão das fontes: {report['source_precision']:.4f}  cobertura das fontes: {report['source_recall']:.4f}")
+    print(f"Relatório salvo em {args.output}")
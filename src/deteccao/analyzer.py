@@ -0,0 +1,24 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from analysis_helper import CachedAnalyzer
+from tokenizer_helper import base_analyzer as tokenizer_base_analyzer
+
+# mesma análise do motor_1 sem sinônimos: a detecção compara o texto copiado, não o assunto
+base_analyzer = tokenizer_base_analyzer()
+
+# mesmo cache da análise do motor_1 com SYNONYM_MODE=query
+cached_analyzer = CachedAnalyzer(base_analyzer)
+
+minhash_index_address = "minhash-index"
+winnowing_index_address = "winnowing-index"
+tfidf_index_address = "tfidf-index"
+
+def char_tokens(text):
+    """
+    Analyzed terms of text with the characters each one spans, which the
+    cache does not keep.
+    """
+    return [(token.text, token.startchar, token.endchar) for token in base_analyzer(text, chars=True, mode="index")]
@@ -0,0 +1,88 @@
+from analyzer import cached_analyzer, minhash_index_address
+from evaluation_helper import write_report
+from file_helper import get_document_store, get_suspicious_documents, precision_at_k, recall_at_k
+from minhash_helper import MinHasher, MinHashIndex, segment_shingles
+from pool_helper import map_ordered
+
+from functools import partial
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+k = [2,4,6,8,10]
+
+def suspicious_shingles(doc, segment_size=0, shingle_size=3):
+    return segment_shingles(cached_analyzer.terms(doc['content']), segment_size, shingle_size)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Busca as fontes de todos os documentos suspeitos no índice MinHash/LSH, assinando todos de uma vez")
+    parser.add_argument("--procs", type=int, default=1, help="processos que analisam os documentos suspeitos")
+    parser.add_argument("--limit", type=int, default=max(k), help="candidatos ranqueados por consulta")
+    parser.add_argument("--max-queries", type=int, help="avalia só os primeiros documentos suspeitos")
+    parser.add_argument("--validate-corpus", action="store_true", help="confere o tamanho e a data de cada arquivo do corpus com o manifesto antes de começar")
+    parser.add_argument("--output", default="avaliacao-minhash.json", help="arquivo do relatório JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(minhash_index_address):
+        print("Índice não encontrado, execute o minhash_indexador.py primeiro")
+        sys.exit(1)
+
+    index = MinHashIndex(minhash_index_address)
+    minhasher = MinHasher(index.meta["num_perm"], index.meta["seed"])
+    # só leitura: o manifesto do corpus é carregado sem conferir cada arquivo, a não ser com --validate-corpus
+    get_document_store(validate=args.validate_corpus)
+
+    suspicious_documents = list(get_suspicious_documents())[:args.max_queries]
+    limit = max(args.limit, max(k))
+
+    print(f"Assinando {len(suspicious_documents)} documentos suspeitos, aguarde...")
+
+    start_time = time.perf_counter()
+    # os segmentos dos documentos suspeitos são analisados na mesma janela usada nas fontes
+    segments = list(map_ordered(partial(suspicious_shingles, segment_size=index.meta["segment_size"], shingle_size=index.meta["shingle_size"]), suspicious_documents, args.procs))
+    queries = [query for query, shingle_sets in enumerate(segments) for _ in shingle_sets]
+    signed_time = time.perf_counter()
+    signatures = minhasher.sign_many([shingles for shingle_sets in segments for shingles in shingle_sets])
+    signing_time = time.perf_counter()
+    results, candidates = index.search_many(signatures, queries, len(suspicious_documents), limit)
+    elapsed = time.perf_counter() - start_time
+
+    retrieved = [[index.document(docnum)['filename'] for docnum, _ in hits] for hits in results]
+    candidate_files = [{index.document(docnum)['filename'] for docnum in docs} for docs in candidates]
+
+    # documentos suspeitos sem plágio não têm fontes para encontrar
+    evaluated = [idx for idx, doc in enumerate(suspicious_documents) if doc.get('src_file')]
+    relevant = {idx: suspicious_documents[idx]['src_file'] for idx in evaluated}
+
+    report = {
+        "engine": "minhash",
+        "index": minhash_index_address,
+        **{key: index.meta[key] for key in ("num_perm", "bands", "rows", "segment_size", "shingle_size")},
+        "queries": len(suspicious_documents),
+        "query_segments": len(queries),
+        "evaluated_queries": len(evaluated),
+        "elapsed_seconds": elapsed,
+        "analysis_seconds": signed_time - start_time,
+        "signing_seconds": signing_time - signed_time,
+        "lookup_seconds": elapsed - (signing_time - start_time),
+        "queries_per_second": len(suspicious_documents) / elapsed if elapsed > 0 else None,
+        "mean_candidates": float(np.mean([len(docs) for docs in candidates])) if candidates else 0.0,
+        # fração das fontes que o LSH deixa passar para o ranqueamento, o teto do R@k
+        "candidate_recall": float(np.mean([len(candidate_files[idx] & set(relevant[idx])) / len(set(relevant[idx])) for idx in evaluated])) if evaluated else 0.0,
+        "precision_at_k": {str(key): float(np.mean([precision_at_k(key, relevant[idx], retrieved[idx]) for idx in evaluated])) if evaluated else 0.0 for key in k},
+        "recall_at_k": {str(key): float(np.mean([recall_at_k(key, relevant[idx], retrieved[idx]) for idx in evaluated])) if evaluated else 0.0 for key in k}
+    }
+
+    write_report(args.output, report)
+
+    print(f"Consultas por segundo: {report.get('queries_per_second') or 0:.2f}")
+    print(f"Candidatos por consulta: {report['mean_candidates']:.2f}  fontes entre os candidatos: {report['candidate_recall']:.4f}")
+
+    for key in k:
+        print(f"P@{key}: {report['precision_at_k'][str(key)]:.4f}  R@{key}: {report['recall_at_k'][str(key)]:.4f}")
+
+    print(f"Relatório salvo em {args.output}")
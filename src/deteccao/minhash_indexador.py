@@ -0,0 +1,66 @@
+from analyzer import cached_analyzer, minhash_index_address
+from file_helper import get_source_documents
+from minhash_helper import MinHasher, segment_shingles, write_minhash_index
+from pool_helper import map_ordered
+
+from functools import partial
+from itertools import islice
+
+import argparse
+import time
+
+import numpy as np
+
+def document_shingles(doc, segment_size=0, shingle_size=3):
+    return {"id": doc["id"], "filename": doc["filename"]}, segment_shingles(cached_analyzer.terms(doc["content"]), segment_size, shingle_size)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera as assinaturas MinHash dos documentos fonte e as tabelas LSH")
+    parser.add_argument("--procs", type=int, default=1, help="processos que analisam os documentos")
+    parser.add_argument("--segment-size", type=int, default=100, help="termos por segmento assinado (janelas com metade de sobreposição); 0 assina o documento inteiro")
+    parser.add_argument("--shingle-size", type=int, default=3, help="palavras por shingle")
+    parser.add_argument("--num-perm", type=int, default=128, help="permutações (tamanho da assinatura)")
+    parser.add_argument("--bands", type=int, default=64, help="bandas do LSH; menos linhas por banda encontram pares menos parecidos")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256, help="documentos assinados de uma vez")
+    args = parser.parse_args()
+
+    if args.num_perm % args.bands:
+        parser.error("--num-perm precisa ser múltiplo de --bands")
+
+    documents_count = sum(1 for _ in get_source_documents())
+    minhasher = MinHasher(args.num_perm, args.seed)
+
+    total_start_time = time.time()
+    print(f"Assinando {documents_count} documentos com {args.procs} processo(s), aguarde...")
+
+    shingled = map_ordered(partial(document_shingles, segment_size=args.segment_size, shingle_size=args.shingle_size), get_source_documents(), args.procs)
+    documents = []
+    segment_documents = []
+    signatures = []
+
+    # os shingles de cada lote são descartados depois de assinados
+    while batch := list(islice(shingled, args.batch_size)):
+        for stored, segments in batch:
+            segment_documents.extend([len(documents)] * len(segments))
+            documents.append(stored)
+
+        signatures.append(minhasher.sign_many([shingles for _, segments in batch for shingles in segments]))
+        print(f"Assinados {len(documents)} documentos ({len(documents) / documents_count * 100:.2f}%)")
+
+    print("Gravando o índice...")
+
+    write_minhash_index(
+        minhash_index_address,
+        np.concatenate(signatures) if signatures else np.empty((0, args.num_perm), dtype=np.uint32),
+        segment_documents,
+        documents,
+        args.bands,
+        seed=args.seed,
+        segment_size=args.segment_size,
+        shingle_size=args.shingle_size,
+        analyzer=cached_analyzer.fingerprint
+    )
+
+    print(f"Documentos indexados com sucesso!")
+    print(f"Tempo total de indexação: {time.time() - total_start_time:.4f} segundos")
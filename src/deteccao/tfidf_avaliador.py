@@ -0,0 +1,69 @@
+from analyzer import cached_analyzer, tfidf_index_address
+from evaluation_helper import evaluate_rankings, write_report
+from file_helper import get_document_store, get_suspicious_documents
+from pool_helper import map_ordered
+from tfidf_helper import TfidfIndex
+
+import argparse
+import os
+import sys
+import time
+
+k = [2,4,6,8,10]
+
+def suspicious_terms(doc):
+    return cached_analyzer.terms(doc['content'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ranqueia as fontes de todos os documentos suspeitos de uma vez pela similaridade TF-IDF")
+    parser.add_argument("--procs", type=int, default=1, help="processos que analisam os documentos suspeitos")
+    parser.add_argument("--limit", type=int, default=max(k), help="resultados por consulta, também a profundidade do MAP")
+    parser.add_argument("--block-mb", type=int, default=256, help="memória do bloco denso de scores de cada produto")
+    parser.add_argument("--max-queries", type=int, help="avalia só os primeiros documentos suspeitos")
+    parser.add_argument("--validate-corpus", action="store_true", help="confere o tamanho e a data de cada arquivo do corpus com o manifesto antes de começar")
+    parser.add_argument("--output", default="avaliacao-tfidf.json", help="arquivo do relatório JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(tfidf_index_address):
+        print("Índice não encontrado, execute o tfidf_indexador.py primeiro")
+        sys.exit(1)
+
+    index = TfidfIndex(tfidf_index_address)
+    # só leitura: o manifesto do corpus é carregado sem conferir cada arquivo, a não ser com --validate-corpus
+    get_document_store(validate=args.validate_corpus)
+
+    suspicious_documents = list(get_suspicious_documents())[:args.max_queries]
+    limit = max(args.limit, max(k))
+
+    print(f"Ranqueando {len(suspicious_documents)} documentos suspeitos contra {index.meta['doc_count']} fontes, aguarde...")
+
+    start_time = time.perf_counter()
+    term_lists = list(map_ordered(suspicious_terms, suspicious_documents, args.procs))
+    analyzed_time = time.perf_counter()
+    results = index.rank_many(term_lists, limit, args.block_mb << 20)
+    elapsed = time.perf_counter() - start_time
+
+    # mesmo formato dos outros motores: nomes dos arquivos fonte em ordem de score
+    retrieved = [[index.document(docnum)['filename'] for docnum, _ in hits] for hits in results]
+    relevant = [doc.get('src_file', []) for doc in suspicious_documents]
+
+    report = {
+        "engine": "tfidf",
+        "index": tfidf_index_address,
+        "queries": len(suspicious_documents),
+        "elapsed_seconds": elapsed,
+        "analysis_seconds": analyzed_time - start_time,
+        "ranking_seconds": elapsed - (analyzed_time - start_time),
+        "queries_per_second": len(suspicious_documents) / elapsed if elapsed > 0 else None,
+        **evaluate_rankings(retrieved, relevant, k, depth=limit)
+    }
+
+    write_report(args.output, report)
+
+    print(f"Consultas por segundo: {report.get('queries_per_second') or 0:.2f}")
+
+    for key in k:
+        print(f"P@{key}: {report.get('precision_at_k', {}).get(str(key), 0):.4f}  R@{key}: {report.get('recall_at_k', {}).get(str(key), 0):.4f}")
+
+    print(f"MAP@{limit}: {report.get('map', 0):.4f}")
+    print(f"Relatório salvo em {args.output}")
@@ -0,0 +1,47 @@
+from analyzer import cached_analyzer, tfidf_index_address
+from file_helper import get_source_documents
+from pool_helper import map_ordered
+from tfidf_helper import build_tfidf_index
+
+import argparse
+import time
+
+def document_terms(doc):
+    return {"id": doc["id"], "filename": doc["filename"]}, cached_analyzer.terms(doc["content"])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera a matriz TF-IDF esparsa dos documentos fonte")
+    parser.add_argument("--procs", type=int, default=1, help="processos que analisam os documentos")
+    parser.add_argument("--min-df", type=int, default=1, help="ignora termos em menos documentos que isso")
+    parser.add_argument("--max-df", type=float, default=1.0, help="ignora termos em uma fração maior dos documentos que isso")
+    parser.add_argument("--raw-tf", action="store_true", help="usa a frequência bruta em vez de 1 + log(tf)")
+    args = parser.parse_args()
+
+    documents_count = sum(1 for _ in get_source_documents())
+    documents = []
+
+    def iter_terms():
+        # os termos vão direto para o TfidfVectorizer; só os ids ficam em memória
+        for idx, (stored, terms) in enumerate(map_ordered(document_terms, get_source_documents(), args.procs)):
+            documents.append(stored)
+
+            if (idx + 1) % 100 == 0 or idx + 1 == documents_count:
+                print(f"Analisados {idx + 1} documentos ({(idx + 1) / documents_count * 100:.2f}%)")
+
+            yield terms
+
+    total_start_time = time.time()
+    print(f"Vetorizando {documents_count} documentos com {args.procs} processo(s), aguarde...")
+
+    shape = build_tfidf_index(
+        tfidf_index_address,
+        iter_terms(),
+        documents,
+        sublinear_tf=not args.raw_tf,
+        min_df=args.min_df,
+        max_df=args.max_df,
+        analyzer=cached_analyzer.fingerprint
+    )
+
+    print(f"Matriz de {shape[0]} documentos por {shape[1]} termos gravada")
+    print(f"Tempo total de indexação: {time.time() - total_start_time:.4f} segundos")
@@ -0,0 +1,42 @@
+from analyzer import base_analyzer, char_tokens, winnowing_index_address
+from analysis_helper import analyzer_fingerprint
+from file_helper import get_source_documents
+from pool_helper import map_ordered
+from winnowing_helper import FingerprintIndexWriter, fingerprint
+
+from functools import partial
+
+import argparse
+import time
+
+def document_fingerprints(doc, kgram_size=5, window=4):
+    return ({"id": doc["id"], "filename": doc["filename"]}, *fingerprint(char_tokens(doc["content"]), kgram_size, window))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera o índice de impressões digitais (winnowing) dos documentos fonte")
+    parser.add_argument("--procs", type=int, default=1, help="processos que analisam os documentos")
+    parser.add_argument("--kgram-size", type=int, default=5, help="termos por n-grama")
+    parser.add_argument("--window", type=int, default=4, help="janela do winnowing; trechos com window + kgram-size - 1 termos sempre são encontrados")
+    parser.add_argument("--shard-size", type=int, default=1 << 22, help="impressões digitais por shard, o que limita a memória da indexação")
+    args = parser.parse_args()
+
+    documents_count = sum(1 for _ in get_source_documents())
+
+    total_start_time = time.time()
+    print(f"Indexando {documents_count} documentos com {args.procs} processo(s), aguarde...")
+
+    writer = FingerprintIndexWriter(winnowing_index_address, args.shard_size)
+    fingerprinted = map_ordered(partial(document_fingerprints, kgram_size=args.kgram_size, window=args.window), get_source_documents(), args.procs)
+
+    for idx, (stored, hashes, fingerprints) in enumerate(fingerprinted):
+        writer.add_document(stored, hashes, fingerprints)
+
+        if (idx + 1) % 100 == 0 or idx + 1 == documents_count:
+            print(f"Processados {idx + 1} documentos ({(idx + 1) / documents_count * 100:.2f}%)")
+
+    print("Gravando o índice...")
+
+    writer.commit(kgram_size=args.kgram_size, window=args.window, analyzer=analyzer_fingerprint(base_analyzer))
+
+    print(f"{writer.fingerprint_count} impressões digitais em {writer.shards} shard(s)")
+    print(f"Tempo total de indexação: {time.time() - total_start_time:.4f} segundos")
@@ -0,0 +1,365 @@
+from collections import OrderedDict
+from functools import lru_cache, partial
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import zlib
+
+import numpy as np
+
+from file_helper import resources_dir, get_source_documents, publish_directory
+from pool_helper import map_ordered
+from tokenizer_helper import base_analyzer
+
+store_format_version = 1
+
+document_store_address = os.path.join(resources_dir, 'document-store')
+
+# a mesma cadeia dos índices, sem sinônimos, que acha os termos da consulta no texto
+snippet_analyzer = base_analyzer()
+
+# maior termo esperado: as janelas de busca dos trechos se sobrepõem nisso
+snippet_overlap = 64
+
+whitespace_pattern = re.compile(r'\s+')
+last_word_pattern = re.compile(r'\s+\S*$')
+
+def zstd_available():
+    try:
+        import zstandard
+    except ImportError:
+        return False
+
+    return True
+
+# zstd quando o pacote zstandard estiver instalado, zlib caso contrário
+default_codec = os.environ.get("DOCSTORE_CODEC") or ("zstd" if zstd_available() else "zlib")
+
+def get_codec(name, level=None):
+    """
+    (compress, decompress) functions of a block codec.
+    """
+    if name == "zlib":
+        level = 6 if level is None else level
+        return (lambda data: zlib.compress(data, level)), zlib.decompress
+
+    if name == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("o codec zstd precisa do pacote zstandard (pip install zstandard)")
+
+        level = 3 if level is None else level
+        # os (des)compressores não são thread-safe; cada chamada cria o seu, o que é barato
+        return (lambda data: zstandard.ZstdCompressor(level=level).compress(data)), (lambda data: zstandard.ZstdDecompressor().decompress(data))
+
+    raise ValueError(f"codec desconhecido: {name}")
+
+def corpus_fingerprint(documents):
+    """
+    Hash of the id, title and content hash (from the corpus manifest) of
+    every document, which changes when any stored document would.
+    """
+    fingerprint = hashlib.sha1()
+
+    for doc in documents:
+        fingerprint.update(f"{doc['id']}\0{doc.get('title')}\0{doc['content_hash']}\n".encode('utf-8'))
+
+    return fingerprint.hexdigest()
+
+def compress_document(doc, block_chars=16384, codec=default_codec):
+    compress, _ = get_codec(codec)
+    content = doc['content'] or ""
+
+    return (
+        doc['id'],
+        doc.get('title'),
+        len(content),
+        [compress(content[start:start + block_chars].encode('utf-8')) for start in range(0, len(content), block_chars)]
+    )
+
+class BlockStoreWriter:
+    """
+    Writes a document store where the text of every document is cut into
+    blocks of block_chars characters, each compressed on its own and
+    appended to a single data file, so reading part of a document only
+    decompresses the blocks that cover it.
+    """
+
+    def __init__(self, address=document_store_address, block_chars=16384, codec=default_codec):
+        self.address = address
+        self.temporary_address = address + ".tmp"
+        self.block_chars = block_chars
+        self.codec = codec
+        self.documents = {}
+        self.offsets = [0]
+
+        shutil.rmtree(self.temporary_address, ignore_errors=True)
+        os.makedirs(self.temporary_address)
+
+        self.data = open(os.path.join(self.temporary_address, "blocks.bin"), "wb")
+
+    def add(self, doc_id, title, length, blocks):
+        """
+        Add a document from the output of compress_document.
+        """
+        self.documents[doc_id] = [title, len(self.offsets) - 1, len(blocks), length]
+
+        for block in blocks:
+            self.data.write(block)
+            self.offsets.append(self.offsets[-1] + len(block))
+
+    def commit(self, **meta):
+        """
+        Write the block offsets and the document table, replacing any store
+        already at the address only once the new one is complete.
+        """
+        self.data.close()
+
+        np.save(os.path.join(self.temporary_address, "blocks.offsets.npy"), np.array(self.offsets, dtype=np.uint64))
+
+        with open(os.path.join(self.temporary_address, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+
+        with open(os.path.join(self.temporary_address, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": store_format_version,
+                "codec": self.codec,
+                "block_chars": self.block_chars,
+                "doc_count": len(self.documents),
+                "blocks": len(self.offsets) - 1,
+                "bytes": self.offsets[-1],
+                **meta
+            }, f, ensure_ascii=False, indent=2)
+
+        publish_directory(self.temporary_address, self.address)
+
+def update_document_store(address=document_store_address, procs=1, block_chars=16384, codec=default_codec):
+    """
+    Rebuild the store of the source documents unless the one at address
+    already holds the current corpus. Returns whether it was rebuilt.
+    """
+    documents = list(get_source_documents())
+    fingerprint = corpus_fingerprint(documents)
+
+    try:
+        with open(os.path.join(address, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("version") == store_format_version and meta.get("corpus") == fingerprint and meta.get("block_chars") == block_chars:
+            return False
+    except FileNotFoundError:
+        pass
+
+    writer = BlockStoreWriter(address, block_chars, codec)
+
+    # o texto é lido e comprimido nos processos do pool
+    for compressed in map_ordered(partial(compress_document, block_chars=block_chars, codec=codec), documents, procs):
+        writer.add(*compressed)
+
+    writer.commit(corpus=fingerprint)
+
+    return True
+
+class BlockDocumentStore:
+    """
+    Read side of BlockStoreWriter. The data file is memory-mapped and the
+    last decompressed blocks are kept in a small LRU, so it can be shared by
+    the threads of a search service.
+    """
+
+    def __init__(self, address=document_store_address, cached_blocks=64):
+        # o link é resolvido uma vez, para que todos os arquivos venham da mesma versão
+        address = os.path.realpath(address)
+        self.address = address
+
+        with open(os.path.join(address, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        if self.meta.get("version") != store_format_version:
+            raise ValueError(f"document store {address} com formato {self.meta.get('version')}, esperado {store_format_version}")
+
+        with open(os.path.join(address, "documents.json"), encoding="utf-8") as f:
+            self.documents = json.load(f)
+
+        self.block_chars = self.meta["block_chars"]
+        self.decompress = get_codec(self.meta["codec"])[1]
+        self.offsets = np.load(os.path.join(address, "blocks.offsets.npy"))
+        self.cached_blocks = cached_blocks
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+
+        with open(os.path.join(address, "blocks.bin"), "rb") as f:
+            # mmap não aceita arquivos vazios
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    def title(self, doc_id):
+        return self.documents[doc_id][0]
+
+    def length(self, doc_id):
+        return self.documents[doc_id][3]
+
+    def block(self, number):
+        with self.lock:
+            text = self.blocks.get(number)
+
+            if text is not None:
+                self.blocks.move_to_end(number)
+                return text
+
+        text = self.decompress(self.data[int(self.offsets[number]):int(self.offsets[number + 1])]).decode('utf-8')
+
+        with self.lock:
+            self.blocks[number] = text
+
+            while len(self.blocks) > self.cached_blocks:
+                self.blocks.popitem(last=False)
+
+        return text
+
+    def read(self, doc_id, start=0, end=None):
+        """
+        Characters [start, end) of a document, decompressing only the blocks
+        that cover them.
+        """
+        _, first_block, block_count, length = self.documents[doc_id]
+        start = max(0, start)
+        end = length if end is None else min(end, length)
+
+        if start >= end:
+            return ""
+
+        blocks = range(start // self.block_chars, (end - 1) // self.block_chars + 1)
+        text = "".join(self.block(first_block + block) for block in blocks)
+        offset = blocks.start * self.block_chars
+
+        return text[start - offset:end - offset]
+
+    def content(self, doc_id):
+        return self.read(doc_id)
+
+    def fragment(self, doc_id, start, end, keep=None):
+        """
+        Characters [start, end) of a document without the words cut at
+        either edge, never trimming into the [keep start, keep end) range.
+        """
+        length = self.length(doc_id)
+        start, end = max(0, start), min(end, length)
+        keep_start, keep_end = keep if keep is not None else (end, start)
+        # um caractere a mais de cada lado mostra se a borda caiu no meio de uma palavra
+        shift = 1 if start else 0
+        text = self.read(doc_id, start - shift, end + 1)
+        left, right = shift, shift + end - start
+
+        if shift and not text[0].isspace() and not text[left:left + 1].isspace():
+            match = whitespace_pattern.search(text, left, max(left, min(right, shift + keep_start - start)))
+
+            if match:
+                left = match.end()
+
+        if end < length and not text[right].isspace() and not text[right - 1].isspace():
+            match = last_word_pattern.search(text, min(right, max(left, shift + keep_end - start)), right)
+
+            if match:
+                right = match.start()
+
+        return text[left:right].strip()
+
+    def snippet(self, doc_id, terms, analyzer=snippet_analyzer, top=3, length=200, separator=" ... "):
+        """
+        Up to top fragments of about length characters around the first
+        occurrences of the analyzed query terms, with the matches in <b>.
+        Blocks are read in order and reading stops once top fragments are
+        found, so a long document is rarely decompressed past its first
+        blocks. Without matches, the beginning of the document.
+        """
+        terms = set(terms)
+        document_length = self.length(doc_id)
+        matches = []
+
+        for offset in range(0, document_length, self.block_chars):
+            # cada janela começa um pouco antes do bloco, para achar os termos cortados na divisa
+            start = max(0, offset - snippet_overlap)
+            end = min(offset + self.block_chars, document_length)
+            text = self.read(doc_id, start, end)
+
+            for token in analyzer(text, chars=True, mode="query"):
+                token_start, token_end = token.startchar + start, token.endchar + start
+
+                # o que encosta no fim da janela pode estar cortado e fica para a próxima,
+                # e o que acaba antes do bloco já foi visto na janela anterior
+                if (token_end == end and end < document_length) or token_end < offset:
+                    continue
+
+                if token.text in terms and (not matches or token_start - matches[-1][0] >= length):
+                    matches.append((token_start, token_end))
+
+                    if len(matches) >= top:
+                        break
+
+            if len(matches) >= top:
+                break
+
+        if not matches:
+            return self.fragment(doc_id, 0, length)
+
+        fragments = []
+
+        for match in matches:
+            start = max(0, match[0] - length // 2)
+            fragment = self.fragment(doc_id, start, start + length, keep=match)
+            fragments.append(highlight(fragment, terms, analyzer))
+
+        return separator.join(fragments)
+
+def highlight(text, terms, analyzer=snippet_analyzer):
+    parts = []
+    last = 0
+
+    for token in analyzer(text, chars=True, mode="query"):
+        if token.text in terms:
+            parts.append(text[last:token.startchar])
+            parts.append(f"<b>{text[token.startchar:token.endchar]}</b>")
+            last = token.endchar
+
+    parts.append(text[last:])
+
+    return "".join(parts)
+
+def document_store_version(address=document_store_address):
+    """
+    Corpus fingerprint of the store at address, which changes whenever a
+    rebuild changes its titles or texts.
+    """
+    with open(os.path.join(address, "meta.json"), encoding="utf-8") as f:
+        return json.load(f).get("corpus")
+
+def open_block_store(address=document_store_address):
+    """
+    BlockDocumentStore at address, opening the new version instead when a
+    rebuild removes the one being opened.
+    """
+    while True:
+        version_address = os.path.realpath(address)
+
+        try:
+            return BlockDocumentStore(version_address)
+        except FileNotFoundError:
+            if os.path.realpath(address) == version_address:
+                raise
+
+@lru_cache(maxsize=2)
+def get_block_store(address=document_store_address, version=None):
+    """
+    Store at address shared by the process. Long-lived callers pass the
+    current document_store_version, so a rebuilt store is opened again.
+    """
+    return open_block_store(address)
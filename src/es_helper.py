@@ -0,0 +1,266 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from elasticsearch import Elasticsearch, TransportError, helpers
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+
+es_pool_size = int(os.environ.get("ES_POOL_SIZE", "10"))
+
+def chunk_actions(actions, chunk_size=500, max_chunk_bytes=100 * 1024 * 1024):
+    """
+    Group a stream of bulk actions into (chunk, size in bytes) lists that
+    respect both the document and the byte limit.
+    """
+    chunk = []
+    chunk_bytes = 0
+
+    for action in actions:
+        action_bytes = len(json.dumps(action, ensure_ascii=False).encode('utf-8')) + 1
+
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + action_bytes > max_chunk_bytes):
+            yield chunk, chunk_bytes
+            chunk = []
+            chunk_bytes = 0
+
+        chunk.append(action)
+        chunk_bytes += action_bytes
+
+    if chunk:
+        yield chunk, chunk_bytes
+
+def send_chunk(es, chunk, chunk_bytes, max_retries, initial_backoff, max_backoff):
+    """
+    Send one chunk as a single _bulk request, retrying documents (or the whole
+    request) rejected with 429 with exponential backoff. Documents still
+    rejected after max_retries, or left unanswered by a request that kept
+    failing, are returned as failed items.
+    """
+    start_time = time.perf_counter()
+    errors = []
+    answered = set()
+
+    try:
+        for ok, item in helpers.streaming_bulk(
+            es,
+            chunk,
+            chunk_size=len(chunk),
+            max_chunk_bytes=chunk_bytes + 1,
+            max_retries=max_retries,
+            initial_backoff=initial_backoff,
+            max_backoff=max_backoff,
+            raise_on_error=False,
+            yield_ok=True
+        ):
+            answered.add(next(iter(item.values())).get("_id"))
+
+            if not ok:
+                errors.append(item)
+    except TransportError as e:
+        # a requisição inteira seguiu rejeitada depois das novas tentativas, ou a conexão caiu
+        errors.extend(
+            {action.get("_op_type", "index"): {"_index": action.get("_index"), "_id": action.get("_id"), "status": e.status_code, "error": str(e)}}
+            for action in chunk
+            if action.get("_id") not in answered
+        )
+
+    return errors, time.perf_counter() - start_time
+
+def bulk_index(
+    es,
+    actions,
+    threads=1,
+    chunk_size=500,
+    max_chunk_bytes=100 * 1024 * 1024,
+    max_retries=5,
+    initial_backoff=2,
+    max_backoff=60
+):
+    """
+    Stream actions into Elasticsearch, with up to threads _bulk requests in flight.
+
+    Only a bounded number of chunks is kept in memory, so actions can be a
+    generator over the whole corpus. Prints throughput for every chunk and
+    returns (documents indexed, failed items).
+    """
+    indexed = 0
+    errors = []
+    start_time = time.perf_counter()
+
+    def report(chunk_idx, chunk_length, chunk_bytes, future):
+        nonlocal indexed
+
+        chunk_errors, elapsed = future.result()
+        elapsed = max(elapsed, 1e-9)
+        indexed += chunk_length - len(chunk_errors)
+        errors.extend(chunk_errors)
+
+        print(
+            f"Lote {chunk_idx}: {chunk_length} documentos, {chunk_bytes / 1024 / 1024:.2f} MB em {elapsed:.4f} segundos "
+            f"({chunk_length / elapsed:.1f} docs/s, {chunk_bytes / 1024 / 1024 / elapsed:.2f} MB/s, "
+            f"{indexed} indexados no total, {indexed / (time.perf_counter() - start_time):.1f} docs/s)"
+        )
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+
+        for chunk_idx, (chunk, chunk_bytes) in enumerate(chunk_actions(actions, chunk_size, max_chunk_bytes)):
+            future = executor.submit(send_chunk, es, chunk, chunk_bytes, max_retries, initial_backoff, max_backoff)
+            pending.append((chunk_idx, len(chunk), chunk_bytes, future))
+
+            # mantém no máximo dois lotes por thread em memória
+            while len(pending) >= threads * 2:
+                report(*pending.popleft())
+
+        while pending:
+            report(*pending.popleft())
+
+    return indexed, errors
+
+# durante a carga não há refresh nem réplicas, e o translog só é descarregado com 1gb
+ingest_settings = {
+    "refresh_interval": "-1",
+    "number_of_replicas": 0,
+    "translog.flush_threshold_size": "1gb"
+}
+
+def search_settings(replicas=1):
+    return {
+        "refresh_interval": "1s",
+        "number_of_replicas": replicas,
+        "translog.flush_threshold_size": "512mb"
+    }
+
+def create_ingest_index(es, alias, mappings, shards=1):
+    """
+    Create a new timestamped index behind alias with an explicit mapping and
+    bulk-ingest settings, and return its name.
+    """
+    # o sufixo aleatório separa duas cargas começadas no mesmo segundo, que senão
+    # disputariam o mesmo índice (e uma apagaria o da outra ao falhar)
+    index_name = f"{alias}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    es.indices.create(index=index_name, body={
+        "settings": {
+            "index": {
+                "number_of_shards": shards,
+                **ingest_settings
+            }
+        },
+        "mappings": mappings
+    })
+
+    return index_name
+
+def finish_ingest_index(es, index_name, replicas=1, force_merge=True):
+    """
+    Restore the search-time settings of an index after the bulk load and
+    optionally force-merge it down to a single segment.
+    """
+    es.indices.put_settings(index=index_name, body={"index": search_settings(replicas)})
+    es.indices.refresh(index=index_name)
+
+    if force_merge:
+        es.indices.forcemerge(index=index_name, max_num_segments=1, request_timeout=3600)
+
+def swap_alias(es, alias, index_name):
+    """
+    Atomically point alias at index_name and drop the indices it served before,
+    including an old concrete index created with the alias name.
+    """
+    actions = []
+
+    if es.indices.exists_alias(name=alias):
+        actions.extend({"remove_index": {"index": old_index}} for old_index in es.indices.get_alias(name=alias))
+    elif es.indices.exists(index=alias):
+        actions.append({"remove_index": {"index": alias}})
+
+    actions.append({"add": {"index": index_name, "alias": alias}})
+
+    es.indices.update_aliases(body={"actions": actions})
+
+clients = {}
+clients_lock = threading.Lock()
+
+def get_client(es_host="http://localhost:9200", maxsize=es_pool_size):
+    """
+    Elasticsearch client shared by the whole process for es_host, keeping up
+    to maxsize connections open so repeated queries skip the TCP handshake.
+    """
+    with clients_lock:
+        if (es_host, maxsize) not in clients:
+            clients[(es_host, maxsize)] = Elasticsearch([es_host], maxsize=maxsize)
+
+        return clients[(es_host, maxsize)]
+
+async_clients = {}
+
+def get_async_client(es_host="http://localhost:9200", maxsize=es_pool_size):
+    """
+    AsyncElasticsearch client for es_host, shared like get_client but tied to
+    the event loop it was created in. Needs the aiohttp package.
+    """
+    try:
+        from elasticsearch import AsyncElasticsearch
+    except ImportError as e:
+        raise ImportError("o cliente assíncrono do Elasticsearch precisa do aiohttp: pip install 'elasticsearch[async]'") from e
+
+    key = (es_host, maxsize, id(asyncio.get_running_loop()))
+
+    if key not in async_clients:
+        async_clients[key] = AsyncElasticsearch([es_host], maxsize=maxsize)
+
+    return async_clients[key]
+
+def msearch_body(index_name, bodies):
+    """
+    Interleave header and body lines of the searches for a single _msearch request.
+    """
+    lines = []
+
+    for body in bodies:
+        lines.append({"index": index_name})
+        lines.append(body)
+
+    return lines
+
+def batched(items, batch_size):
+    batch = []
+
+    for item in items:
+        batch.append(item)
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+def msearch(es, index_name, bodies, batch_size=100):
+    """
+    Run the searches in bodies with one _msearch request per batch_size of
+    them and yield their responses in order. A search that failed yields its
+    error response, with an "error" key instead of "hits".
+    """
+    for batch in batched(bodies, batch_size):
+        yield from es.msearch(body=msearch_body(index_name, batch))["responses"]
+
+async def msearch_async(es, index_name, bodies, batch_size=100, concurrency=4):
+    """
+    msearch over an AsyncElasticsearch client, with up to concurrency
+    _msearch requests in flight. Returns the responses in order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(batch):
+        async with semaphore:
+            return (await es.msearch(body=msearch_body(index_name, batch)))["responses"]
+
+    batches = await asyncio.gather(*(send(batch) for batch in batched(bodies, batch_size)))
+
+    return [response for responses in batches for response in responses]
@@ -0,0 +1,81 @@
+from collections import Counter
+
+import json
+import numpy as np
+
+def query_terms(terms, max_terms=30):
+    """
+    The max_terms most frequent analyzed terms of a suspicious document, used
+    as its source-retrieval query.
+    """
+    return [term for term, _ in Counter(terms).most_common(max_terms)]
+
+def relevance_matrix(retrieved, relevant, depth):
+    """
+    Boolean (queries x depth) matrix telling whether the document at each rank
+    of each query is one of its relevant documents.
+    """
+    matrix = np.zeros((len(retrieved), depth), dtype=bool)
+
+    for row, (retrieved_documents, relevant_documents) in enumerate(zip(retrieved, relevant)):
+        relevant_documents = set(relevant_documents)
+        hits = [document in relevant_documents for document in retrieved_documents[:depth]]
+        matrix[row, :len(hits)] = hits
+
+    return matrix
+
+def evaluate_rankings(retrieved, relevant, ks=(2, 4, 6, 8, 10), depth=None):
+    """
+    Mean P@k and R@k for every k and MAP at depth over all the queries, computed
+    on the relevance matrix at once. Queries without relevant documents
+    (suspicious documents with no plagiarism) are left out.
+    """
+    depth = depth or max(ks)
+    evaluated = [idx for idx, relevant_documents in enumerate(relevant) if relevant_documents]
+
+    if not evaluated:
+        return {"evaluated_queries": 0}
+
+    matrix = relevance_matrix([retrieved[idx] for idx in evaluated], [relevant[idx] for idx in evaluated], max(depth, *ks))
+    relevant_counts = np.array([len(set(relevant[idx])) for idx in evaluated], dtype=float)
+    hits_at = np.cumsum(matrix, axis=1)
+
+    # a precisão em cada posição só conta nas posições com documento relevante
+    ranks = np.arange(1, depth + 1)
+    average_precision = (hits_at[:, :depth] / ranks * matrix[:, :depth]).sum(axis=1) / relevant_counts
+
+    return {
+        "evaluated_queries": len(evaluated),
+        "precision_at_k": {str(k): float((hits_at[:, k - 1] / k).mean()) for k in ks},
+        "recall_at_k": {str(k): float((hits_at[:, k - 1] / relevant_counts).mean()) for k in ks},
+        "map": float(average_precision.mean()),
+        "map_depth": depth
+    }
+
+def latency_summary(latencies, elapsed):
+    """
+    Throughput and latency percentiles (in milliseconds) of a run of queries.
+    """
+    if not latencies:
+        return {"queries": 0}
+
+    latencies = np.array(latencies) * 1000
+    p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+
+    return {
+        "queries": len(latencies),
+        "elapsed_seconds": elapsed,
+        "queries_per_second": len(latencies) / elapsed if elapsed > 0 else None,
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p50": float(p50),
+            "p90": float(p90),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(latencies.max())
+        }
+    }
+
+def write_report(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
@@ -1,84 +1,367 @@
+import hashlib
 import json
+import mmap
+import pickle
 import xml.etree.ElementTree as ET
 
+from concurrent.futures import ProcessPoolExecutor
+
 import os
+import shutil
 import time
+import uuid
 
 current_dir = os.path.dirname(__file__)
+resources_dir = f'{current_dir}/../resources'
+papers_file = f'{resources_dir}/papers.json'
+manifest_file = f'{resources_dir}/corpus-manifest.pickle'
+manifest_version = 1
+
+# abaixo disso o custo de subir o pool supera o ganho
+parallel_load_threshold = 64
+
+# "1" confere o tamanho e a data de cada arquivo do corpus em toda carga do manifesto
+corpus_validate = os.environ.get("CORPUS_VALIDATE", "0") == "1"
+
+class LazyDocument(dict):
+    """
+    Corpus document holding only metadata in memory.
+
+    The text is read from disk every time 'content' is accessed, so holding
+    thousands of documents costs the size of their metadata, not the corpus.
+    """
+
+    def __missing__(self, key):
+        if key == 'content':
+            return self.read_content()
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key == 'content':
+            return self.read_content()
+        return super().get(key, default)
+
+    def read_content(self, start=0, end=None):
+        """
+        Read the document text, or only the byte range [start, end) of it
+        through a memory map.
+        """
+        if start == 0 and end is None:
+            with open(self['path'], 'r') as txt_file:
+                return txt_file.read()
+
+        with open(self['path'], 'rb') as txt_file:
+            if os.fstat(txt_file.fileno()).st_size == 0:
+                return ''
+            with mmap.mmap(txt_file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                return content[start:end].decode('utf-8', errors='ignore')
+
+def read_title(document_type, file_name_without_extension):
+    file_name_xml = f'{file_name_without_extension}.xml'
+
+    with open(f'{resources_dir}/{document_type}/{file_name_xml}', 'r') as xml_file:
+        xml_content = xml_file.read()
+
+        try:
+            root = ET.fromstring(xml_content)
+            feature_element = root.find('.//feature[@title]')
+
+            if feature_element is not None:
+                return feature_element.get('title')
+        except Exception as e:
+            print(f'Error parsing XML: {file_name_xml} {e}')
+
+def hash_file(path, chunk_size=1 << 20):
+    content_hash = hashlib.sha1()
+
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            content_hash.update(chunk)
+
+    return content_hash.hexdigest()
+
+def stat_document(document_type, file_name):
+    """
+    Return (txt size, txt mtime, xml size, xml mtime), used to tell whether a
+    manifest entry is still valid without reading the files.
+    """
+    file_name_without_extension = file_name.split('.')[0]
+    txt_stat = os.stat(f'{resources_dir}/{document_type}/{file_name}')
+    xml_stat = os.stat(f'{resources_dir}/{document_type}/{file_name_without_extension}.xml')
+
+    return txt_stat.st_size, txt_stat.st_mtime_ns, xml_stat.st_size, xml_stat.st_mtime_ns
+
+def build_manifest_entry(document):
+    """
+    Parse the XML title and hash the text of a papers.json document.
+
+    Manifest entries are tuples of
+    (filename, type, src_file, title, stat, content_hash).
+    """
+    file_name_without_extension = document['filename'].split('.')[0]
+
+    title = read_title(document['type'], file_name_without_extension)
+    content_hash = hash_file(f'{resources_dir}/{document["type"]}/{document["filename"]}')
+
+    return (
+        document['filename'],
+        document['type'],
+        tuple(document.get('src_file', ())),
+        title,
+        stat_document(document['type'], document['filename']),
+        content_hash
+    )
+
+def load_manifest(manifest=manifest_file):
+    try:
+        with open(manifest, 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+    if data.get('version') != manifest_version:
+        return None
+
+    return data
+
+def save_manifest(data, manifest=manifest_file):
+    with open(f'{manifest}.tmp', 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(f'{manifest}.tmp', manifest)
+
+def publish_directory(temporary_address, address):
+    """
+    Replace the directory at address with the complete one at
+    temporary_address without address ever going missing: the new directory
+    is renamed to a versioned sibling, address becomes a symlink to it
+    swapped in with a single rename, and only then the previous version is
+    removed. Where symlinks cannot be created, the old directory is removed
+    and the new one renamed in its place.
+    """
+    version_address = f"{address}.{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.replace(temporary_address, version_address)
+
+    previous = os.path.realpath(address) if os.path.islink(address) else None
+    link = f"{address}.link"
+
+    try:
+        if os.path.lexists(link):
+            os.remove(link)
+
+        os.symlink(os.path.basename(version_address), link, target_is_directory=True)
+    except OSError:
+        # sem permissão para criar links (Windows fora do modo de desenvolvedor): troca não atômica
+        if os.path.islink(address):
+            os.remove(address)
+        else:
+            shutil.rmtree(address, ignore_errors=True)
+
+        os.replace(version_address, address)
+    else:
+        # um diretório comum, gravado antes dos links, não pode ser trocado por rename
+        if os.path.isdir(address) and not os.path.islink(address):
+            shutil.rmtree(address)
+
+        os.replace(link, address)
+
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+
+def file_stat(path):
+    path_stat = os.stat(path)
+    return path_stat.st_size, path_stat.st_mtime_ns
+
+def stat_directories(document_types):
+    return {document_type: file_stat(f'{resources_dir}/{document_type}') for document_type in sorted(document_types)}
+
+def build_manifest_entries(documents, procs=None, chunksize=32):
+    """
+    Build the manifest entries of documents, in the same order.
+
+    With more than one process the XML parsing and hashing run in a process
+    pool; progress is reported in aggregate every 10%.
+    """
+    procs = procs or os.cpu_count() or 1
+
+    if procs == 1 or len(documents) < parallel_load_threshold:
+        return [build_manifest_entry(document) for document in documents]
+
+    entries = []
+    progress_step = max(1, len(documents) // 10)
+    start_time = time.perf_counter()
 
-documents = []
-
-print("Carregando documentos, aguarde...")
-start_time = time.time()
-
-with open(f'{current_dir}/../resources/papers.json', 'r') as f:
-    for idx, document in enumerate(json.load(f)):
-        # abra o xml do document
-        
-        file_name_without_extension = document['filename'].split('.')[0]
-        file_name_xml = f'{file_name_without_extension}.xml'
-        
-        with open(f'{current_dir}/../resources/{document['type']}/{file_name_xml}', 'r') as xml_file:
-            xml_content = xml_file.read()
-            
-            try:
-                root = ET.fromstring(xml_content)
-                feature_element = root.find('.//feature[@title]')
-                
-                if feature_element is not None:
-                    document['title'] = feature_element.get('title')
-            except Exception as e:
-                print(f'Error parsing XML: {file_name_xml} {e}')
-        
-        with open(f'{current_dir}/../resources/{document["type"]}/{document["filename"]}', 'r') as txt_file:
-            document['content'] = txt_file.read()
-        
-        document['path'] = current_dir + '/../resources/' + document['type'] + '/' + document['filename']
-        document['id'] = f'{file_name_without_extension}-{idx}'
-        documents.append(document)
-
-print(f"Documentos carregados com sucesso ({time.time() - start_time:.4f}s)")
+    with ProcessPoolExecutor(max_workers=procs) as executor:
+        for entry in executor.map(build_manifest_entry, documents, chunksize=chunksize):
+            entries.append(entry)
+
+            if len(entries) % progress_step == 0 or len(entries) == len(documents):
+                elapsed = time.perf_counter() - start_time
+                print(f"Processados {len(entries)} de {len(documents)} documentos ({len(entries) / elapsed:.1f} docs/s)")
+
+    return entries
+
+def build_manifest(json_file=papers_file, manifest=manifest_file, validate=None, procs=None):
+    """
+    Load the corpus manifest, rebuilding only the entries whose files changed.
+
+    When papers.json is unchanged and validate is False, this is a single
+    file read. By default (validate None) the corpus directories are stat'ed
+    too, which catches files added, removed or replaced but not edited in
+    place; only when one of them changed, or with validate (or
+    CORPUS_VALIDATE=1), every document is stat'ed (never read) and only
+    stale or new entries are parsed and hashed again, in parallel across
+    procs processes.
+    """
+    data = load_manifest(manifest)
+    papers_stat = file_stat(json_file)
+
+    if validate is None:
+        validate = corpus_validate or None
+
+    if data is not None and data['papers'] == papers_stat:
+        if validate is False:
+            return data['entries']
+
+        if validate is None and data.get('directories') == stat_directories({entry[1] for entry in data['entries']}):
+            return data['entries']
+
+    if data is not None and data['papers'] == papers_stat:
+        papers = [
+            {'filename': entry[0], 'type': entry[1], 'src_file': list(entry[2])}
+            for entry in data['entries']
+        ]
+    else:
+        with open(json_file, 'r') as f:
+            papers = json.load(f)
+
+    previous_entries = {entry[0]: entry for entry in data['entries']} if data is not None else {}
+    # antes dos arquivos: uma mudança durante a validação é conferida de novo na próxima carga
+    directories = stat_directories({document['type'] for document in papers})
+
+    entries = []
+    stale = []
+
+    for idx, document in enumerate(papers):
+        entry = previous_entries.get(document['filename'])
+
+        if entry is None or entry[4] != stat_document(document['type'], document['filename']):
+            stale.append(idx)
+        elif entry[1] != document['type'] or list(entry[2]) != document.get('src_file', []):
+            entry = (entry[0], document['type'], tuple(document.get('src_file', ())), *entry[3:])
+
+        entries.append(entry)
+
+    for idx, entry in zip(stale, build_manifest_entries([papers[idx] for idx in stale], procs)):
+        entries[idx] = entry
+
+    if data is None or stale or data['papers'] != papers_stat or len(entries) != len(data['entries']) or data.get('directories') != directories:
+        print(f"Manifesto do corpus atualizado ({len(stale)} de {len(entries)} documentos processados)")
+        save_manifest({'version': manifest_version, 'papers': papers_stat, 'directories': directories, 'entries': entries}, manifest)
+
+    return entries
+
+class DocumentStore:
+    """
+    Index of the corpus described by papers.json with O(1) lookup by file name and id.
+    """
+
+    def __init__(self, json_file=papers_file, manifest=manifest_file, validate=None, procs=None):
+        self.documents = []
+        self.documents_by_file_name = {}
+        self.documents_by_id = {}
+
+        for idx, entry in enumerate(build_manifest(json_file, manifest, validate, procs)):
+            file_name, document_type, src_file, title, document_stat, content_hash = entry
+            file_name_without_extension = file_name.split('.')[0]
+
+            document = LazyDocument(filename=file_name, type=document_type)
+
+            if document_type == 'suspicious-document' or src_file:
+                document['src_file'] = list(src_file)
+
+            if title is not None:
+                document['title'] = title
+
+            document['path'] = resources_dir + '/' + document_type + '/' + file_name
+            document['id'] = f'{file_name_without_extension}-{idx}'
+            document['size'] = document_stat[0]
+            document['content_hash'] = content_hash
+            self.add(document)
+
+    def add(self, document):
+        self.documents.append(document)
+        self.documents_by_file_name[document['filename']] = document
+        self.documents_by_id[document['id']] = document
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def get_by_file_name(self, file_name: str):
+        return self.documents_by_file_name.get(file_name)
+
+    def get_by_id(self, document_id: str):
+        return self.documents_by_id.get(document_id)
+
+document_store = None
+
+def get_document_store(validate=None, procs=None):
+    global document_store
+
+    if document_store is None:
+        print("Carregando documentos, aguarde...")
+        start_time = time.time()
+
+        document_store = DocumentStore(validate=validate, procs=procs)
+
+        print(f"Documentos carregados com sucesso ({time.time() - start_time:.4f}s)")
+
+    return document_store
 
 def precision_at_k(k, relevant_documents, retrieved_documents):
     relevant_documents = set(relevant_documents)
     retrieved_documents = set(retrieved_documents[:k])
-    
+
     return len(relevant_documents.intersection(retrieved_documents)) / k
 
 def recall_at_k(k, relevant_documents, retrieved_documents):
     relevant_documents = set(relevant_documents)
     retrieved_documents = set(retrieved_documents[:k])
-    
+
     return len(relevant_documents.intersection(retrieved_documents)) / len(relevant_documents)
 
 def get_documents():
-    return documents
+    return get_document_store().documents
 
 def get_suspicious_documents():
-    for document in documents:
+    for document in get_document_store():
         if document['type'] == 'suspicious-document':
             yield document
 
 def get_source_documents():
-    for document in documents:
+    for document in get_document_store():
         if document['type'] == 'source-document':
             yield document
 
 def get_document_by_file_name(file_name: str):
-    for document in documents:
-        if document['filename'] == file_name:
-            return document
+    return get_document_store().get_by_file_name(file_name)
+
+def get_document_by_id(document_id: str):
+    return get_document_store().get_by_id(document_id)
 
 def get_source_documents_from_suspicious():
     source_documents = set()
-    
+
     for document in get_suspicious_documents():
         for source_document in document['src_file']:
             source_documents.add(source_document)
-        
+
     return source_documents
 
 def calculate_found_percentage(suspicious_document_file_name: str, source_documents_found: int):
     suspicious_document = get_document_by_file_name(suspicious_document_file_name)
     source_documents = suspicious_document['src_file']
-    return source_documents_found / len(source_documents)
\ No newline at end of file
+    return source_documents_found / len(source_documents)
@@ -0,0 +1,204 @@
+from array import array
+from collections import Counter
+from whoosh.util.numeric import byte_to_length, length_to_byte
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+index_format_version = 1
+
+def quantize_length(length):
+    # o Whoosh guarda o tamanho de cada campo em um byte; usar os mesmos valores deixa os scores iguais aos dele
+    return byte_to_length(length_to_byte(length))
+
+class InvertedIndexWriter:
+    """
+    Builds an in-process inverted index.
+
+    Each field is saved as CSR arrays over a shared sorted vocabulary:
+    offsets (one row per term), document numbers and term weights, plus the
+    length of the field in every document. All of them are .npy files that
+    InvertedIndex memory-maps.
+    """
+
+    def __init__(self, address, field_boosts, B=0.75, K1=1.2):
+        self.address = address
+        self.field_boosts = field_boosts
+        self.B = B
+        self.K1 = K1
+        self.vocabulary = {}
+        self.documents = []
+        self.postings = {field: (array('I'), array('I'), array('f')) for field in field_boosts}
+        self.lengths = {field: array('f') for field in field_boosts}
+        self.field_lengths = {field: 0 for field in field_boosts}
+
+    def add_document(self, stored, fields):
+        """
+        Add a document from its stored values (id, title, path...) and the
+        analyzed terms of each field.
+        """
+        docnum = len(self.documents)
+        self.documents.append(stored)
+
+        for field in self.field_boosts:
+            terms = fields.get(field, [])
+            term_ids, docnums, weights = self.postings[field]
+
+            for term, frequency in Counter(terms).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                docnums.append(docnum)
+                weights.append(frequency)
+
+            self.lengths[field].append(quantize_length(len(terms)))
+            self.field_lengths[field] += len(terms)
+
+    def commit(self, **meta):
+        """
+        Sort the postings by term and write the index, replacing any index
+        already at the address only once the new one is complete.
+        """
+        temporary_address = self.address + ".tmp"
+        shutil.rmtree(temporary_address, ignore_errors=True)
+        os.makedirs(temporary_address)
+
+        terms = list(self.vocabulary)
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        remap = np.empty(len(terms), dtype=np.int64)
+        remap[order] = np.arange(len(terms))
+
+        with open(os.path.join(temporary_address, "terms.txt"), "w", encoding="utf-8") as f:
+            f.writelines(terms[idx] + "\n" for idx in order)
+
+        for field, (term_ids, docnums, weights) in self.postings.items():
+            term_ids = remap[np.frombuffer(term_ids, dtype=np.uint32)] if term_ids else np.empty(0, dtype=np.int64)
+            # a ordenação estável mantém os documentos de cada termo em ordem crescente
+            permutation = np.argsort(term_ids, kind="stable")
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+
+            np.save(os.path.join(temporary_address, f"{field}.offsets.npy"), offsets)
+            np.save(os.path.join(temporary_address, f"{field}.docs.npy"), np.frombuffer(docnums, dtype=np.uint32)[permutation].astype(np.int32))
+            np.save(os.path.join(temporary_address, f"{field}.weights.npy"), np.frombuffer(weights, dtype=np.float32)[permutation])
+            np.save(os.path.join(temporary_address, f"{field}.lengths.npy"), np.frombuffer(self.lengths[field], dtype=np.float32))
+
+            # libera a memória do campo antes de passar para o próximo
+            self.postings[field] = None
+
+        with open(os.path.join(temporary_address, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+
+        with open(os.path.join(temporary_address, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": index_format_version,
+                "doc_count": len(self.documents),
+                "field_boosts": self.field_boosts,
+                "field_lengths": self.field_lengths,
+                "B": self.B,
+                "K1": self.K1,
+                **meta
+            }, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(self.address, ignore_errors=True)
+        os.replace(temporary_address, self.address)
+
+class InvertedIndex:
+    """
+    Read side of an InvertedIndexWriter index, scoring queries with BM25F as
+    whoosh.scoring.BM25F does (field boosts scale the term weights, one idf
+    and average length per field) over whole posting lists at once.
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+        with open(os.path.join(address, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        if self.meta.get("version") != index_format_version:
+            raise ValueError(f"índice {address} com formato {self.meta.get('version')}, esperado {index_format_version}")
+
+        with open(os.path.join(address, "terms.txt"), encoding="utf-8") as f:
+            self.term_ids = {line.rstrip("\n"): idx for idx, line in enumerate(f)}
+
+        with open(os.path.join(address, "documents.json"), encoding="utf-8") as f:
+            self.documents = json.load(f)
+
+        self.doc_count = self.meta["doc_count"]
+        self.field_boosts = self.meta["field_boosts"]
+        self.B = self.meta["B"]
+        self.K1 = self.meta["K1"]
+        self.avg_field_lengths = {field: (length / (self.doc_count or 1)) or 1 for field, length in self.meta["field_lengths"].items()}
+        self.arrays = {
+            field: {
+                name: np.load(os.path.join(address, f"{field}.{name}.npy"), mmap_mode="r")
+                for name in ("offsets", "docs", "weights", "lengths")
+            }
+            for field in self.field_boosts
+        }
+
+    def score_field(self, field, term_ids, query_weights):
+        """
+        BM25 contribution of one field to every document, as a dense array.
+        """
+        arrays = self.arrays[field]
+        starts = arrays["offsets"][term_ids]
+        ends = arrays["offsets"][term_ids + 1]
+        counts = ends - starts
+
+        if not counts.sum():
+            return None
+
+        # posições de todas as listas de postings da consulta, concatenadas
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        docs = arrays["docs"][positions]
+        weights = arrays["weights"][positions] * self.field_boosts[field]
+        lengths = arrays["lengths"][docs]
+
+        idf = np.log(self.doc_count / (counts + 1)) + 1
+        term_factor = np.repeat(idf * query_weights, counts)
+        normalization = self.K1 * ((1 - self.B) + self.B * lengths / self.avg_field_lengths[field])
+        scores = term_factor * (weights * (self.K1 + 1)) / (weights + normalization)
+
+        return np.bincount(docs, weights=scores, minlength=self.doc_count)
+
+    def search_terms(self, terms, k=10):
+        """
+        The k best (document number, score) pairs for the query terms ORed
+        together. Like a Whoosh Or query, a repeated term counts once.
+        """
+        return self.search_weights(dict.fromkeys(terms, 1.0), k)
+
+    def search_weights(self, term_weights, k=10):
+        """
+        search_terms with an explicit weight (query boost) for each term.
+        """
+        term_weights = {term: weight for term, weight in term_weights.items() if term in self.term_ids}
+
+        if not term_weights or not self.doc_count:
+            return []
+
+        term_ids = np.array([self.term_ids[term] for term in term_weights], dtype=np.int64)
+        query_weights = np.array(list(term_weights.values()), dtype=np.float64)
+        scores = np.zeros(self.doc_count)
+
+        for field in self.field_boosts:
+            field_scores = self.score_field(field, term_ids, query_weights)
+
+            if field_scores is not None:
+                scores += field_scores
+
+        matched = np.flatnonzero(scores)
+
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+
+        # empates ficam na ordem dos documentos, como no Whoosh
+        matched = matched[np.lexsort((matched, -scores[matched]))]
+
+        return [(int(docnum), float(scores[docnum])) for docnum in matched]
+
+    def document(self, docnum):
+        return self.documents[docnum]
@@ -0,0 +1,260 @@
+import json
+import os
+import shutil
+import zlib
+
+import numpy as np
+
+index_format_version = 1
+
+# assinatura de um documento sem nenhum shingle: não colide com nenhuma outra
+empty_value = np.iinfo(np.uint32).max
+
+def term_hashes(terms):
+    return np.fromiter((zlib.crc32(term.encode("utf-8")) for term in terms), dtype=np.uint64, count=len(terms))
+
+def ngram_hashes(terms, size=3):
+    """
+    32-bit hash of every word n-gram of a list of terms, in text order,
+    computed at once from the hashes of the terms. A text shorter than size
+    becomes a single n-gram.
+    """
+    if not terms:
+        return np.empty(0, dtype=np.uint32)
+
+    hashes = term_hashes(terms)
+    size = min(size, len(hashes))
+    count = len(hashes) - size + 1
+    multipliers = np.random.default_rng(size).integers(1, 2**63, size=size, dtype=np.uint64) | np.uint64(1)
+
+    combined = np.zeros(count, dtype=np.uint64)
+
+    # a multiplicação em uint64 dá a volta, como um hash polinomial módulo 2^64
+    for offset in range(size):
+        combined += hashes[offset:offset + count] * multipliers[offset]
+
+    return ((combined >> np.uint64(32)) ^ combined).astype(np.uint32)
+
+def shingle_hashes(terms, size=3):
+    """
+    Distinct hashes of the word n-grams (shingles) of a list of terms.
+    """
+    return np.unique(ngram_hashes(terms, size))
+
+def segment_shingles(terms, segment_size=0, shingle_size=3):
+    """
+    Shingle hashes of overlapping windows of segment_size terms (half a window
+    apart), or of the whole text when segment_size is 0. Reused passages are a
+    small part of a document, so they are only similar window to window.
+    A text without terms has no segments.
+    """
+    if not terms:
+        return []
+
+    if not segment_size or len(terms) <= segment_size:
+        return [shingle_hashes(terms, shingle_size)]
+
+    stride = max(segment_size // 2, 1)
+    starts = range(0, len(terms) - segment_size + stride, stride)
+
+    return [shingle_hashes(terms[start:start + segment_size], shingle_size) for start in starts]
+
+class MinHasher:
+    """
+    MinHash signatures over 32-bit shingle hashes.
+
+    Each of the num_perm permutations is a multiply-shift hash
+    ((a * x + b) mod 2^64) >> 32 with a random odd a, so the whole signature
+    of a block of shingles is a single (num_perm x shingles) array operation.
+    Blocks hold at most chunk_size shingles, which bounds memory for any
+    document.
+    """
+
+    def __init__(self, num_perm=128, seed=1, chunk_size=1 << 16):
+        self.num_perm = num_perm
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+        rng = np.random.default_rng(seed)
+        self.a = (rng.integers(0, 2**64, size=num_perm, dtype=np.uint64) | np.uint64(1))[:, None]
+        self.b = rng.integers(0, 2**64, size=num_perm, dtype=np.uint64)[:, None]
+
+    def permute(self, shingles):
+        return ((self.a * shingles.astype(np.uint64) + self.b) >> np.uint64(32)).astype(np.uint32)
+
+    def sign(self, shingles):
+        return self.sign_many([shingles])[0]
+
+    def sign_many(self, shingle_sets):
+        """
+        Signatures (documents x num_perm) of many documents at once: small
+        documents are concatenated into blocks and reduced per document with
+        minimum.reduceat, large ones are folded block by block.
+        """
+        signatures = np.full((len(shingle_sets), self.num_perm), empty_value, dtype=np.uint32)
+
+        if not len(signatures):
+            return signatures
+
+        batch, batch_size = [], 0
+
+        def flush():
+            indexes = [idx for idx, _ in batch]
+            lengths = [len(shingles) for _, shingles in batch]
+            starts = np.cumsum([0] + lengths[:-1])
+            permuted = self.permute(np.concatenate([shingles for _, shingles in batch]))
+            signatures[indexes] = np.minimum.reduceat(permuted, starts, axis=1).T
+
+        for idx, shingles in enumerate(shingle_sets):
+            if not len(shingles):
+                continue
+
+            if len(shingles) > self.chunk_size:
+                for start in range(0, len(shingles), self.chunk_size):
+                    np.minimum(signatures[idx], self.permute(shingles[start:start + self.chunk_size]).min(axis=1), out=signatures[idx])
+                continue
+
+            if batch_size + len(shingles) > self.chunk_size:
+                flush()
+                batch, batch_size = [], 0
+
+            batch.append((idx, shingles))
+            batch_size += len(shingles)
+
+        if batch:
+            flush()
+
+        return signatures
+
+def band_keys(signatures, bands):
+    """
+    One 64-bit key per band of rows of each signature; two documents share a
+    key only if they agree on every row of that band.
+    """
+    signatures = np.asarray(signatures, dtype=np.uint64)
+    rows = signatures.shape[1] // bands
+    multipliers = np.random.default_rng(rows).integers(1, 2**63, size=rows, dtype=np.uint64) | np.uint64(1)
+
+    return (signatures[:, :bands * rows].reshape(len(signatures), bands, rows) * multipliers).sum(axis=2, dtype=np.uint64)
+
+def write_minhash_index(address, signatures, segment_documents, documents, bands, **meta):
+    """
+    Save the segment signatures, the document number of each segment and, for
+    every band, its keys sorted with the matching segment numbers, so the LSH
+    lookup is a binary search on memory-mapped arrays. The index at address
+    is only replaced once the new one is complete.
+    """
+    signatures = np.asarray(signatures, dtype=np.uint32)
+
+    if signatures.shape[1] % bands:
+        raise ValueError(f"{signatures.shape[1]} permutações não se dividem em {bands} bandas")
+
+    temporary_address = address + ".tmp"
+    shutil.rmtree(temporary_address, ignore_errors=True)
+    os.makedirs(temporary_address)
+
+    keys = band_keys(signatures, bands)
+    # a ordenação estável mantém os segmentos de cada chave em ordem crescente
+    order = np.argsort(keys, axis=0, kind="stable")
+
+    np.save(os.path.join(temporary_address, "signatures.npy"), signatures)
+    np.save(os.path.join(temporary_address, "segments.docs.npy"), np.asarray(segment_documents, dtype=np.int32))
+    np.save(os.path.join(temporary_address, "bands.keys.npy"), np.ascontiguousarray(np.take_along_axis(keys, order, axis=0).T))
+    np.save(os.path.join(temporary_address, "bands.docs.npy"), np.ascontiguousarray(order.T.astype(np.int32)))
+
+    with open(os.path.join(temporary_address, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump(documents, f, ensure_ascii=False)
+
+    with open(os.path.join(temporary_address, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": index_format_version,
+            "doc_count": len(documents),
+            "segment_count": len(signatures),
+            "num_perm": signatures.shape[1],
+            "bands": bands,
+            "rows": signatures.shape[1] // bands,
+            **meta
+        }, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(address, ignore_errors=True)
+    os.replace(temporary_address, address)
+
+class MinHashIndex:
+    """
+    Read side of write_minhash_index: LSH candidate lookup of segments, with
+    documents ranked by the best Jaccard similarity (estimated from the
+    signatures) between one of their segments and one of the query's.
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+        with open(os.path.join(address, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        if self.meta.get("version") != index_format_version:
+            raise ValueError(f"índice {address} com formato {self.meta.get('version')}, esperado {index_format_version}")
+
+        with open(os.path.join(address, "documents.json"), encoding="utf-8") as f:
+            self.documents = json.load(f)
+
+        self.bands = self.meta["bands"]
+        self.signatures = np.load(os.path.join(address, "signatures.npy"), mmap_mode="r")
+        self.segment_documents = np.load(os.path.join(address, "segments.docs.npy"), mmap_mode="r")
+        self.keys = np.load(os.path.join(address, "bands.keys.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(address, "bands.docs.npy"), mmap_mode="r")
+
+    def candidates_many(self, signatures):
+        """
+        Segment numbers sharing at least one band key with each signature,
+        looking up every band of every signature in one searchsorted per band.
+        """
+        keys = band_keys(signatures, self.bands)
+        found = [[] for _ in range(len(keys))]
+
+        for band in range(self.bands):
+            starts = np.searchsorted(self.keys[band], keys[:, band], side="left")
+            ends = np.searchsorted(self.keys[band], keys[:, band], side="right")
+
+            for row in np.flatnonzero(ends > starts):
+                found[row].append(self.docs[band, starts[row]:ends[row]])
+
+        return [np.unique(np.concatenate(segments)) if segments else np.empty(0, dtype=np.int32) for segments in found]
+
+    def search_many(self, signatures, queries, query_count=None, k=10):
+        """
+        The k best (document number, estimated Jaccard) pairs of each query,
+        among the LSH candidates of its segments only. queries holds the
+        query number of each row of signatures, so the segments of every
+        query are looked up together, and query_count counts the queries
+        left without segments too. Also returns the candidate document
+        numbers of each query.
+        """
+        signatures = np.asarray(signatures, dtype=np.uint32)
+        queries = np.asarray(queries, dtype=np.int64)
+
+        if query_count is None:
+            query_count = int(queries.max()) + 1 if len(queries) else 0
+
+        best_scores = [{} for _ in range(query_count)]
+
+        for query, signature, candidates in zip(queries, signatures, self.candidates_many(signatures)):
+            if not len(candidates):
+                continue
+
+            scores = (self.signatures[candidates] == signature).mean(axis=1)
+            documents = self.segment_documents[candidates]
+            order = np.lexsort((-scores, documents))
+            # o primeiro segmento de cada documento na ordem acima é o de maior score
+            first = order[np.r_[True, documents[order][1:] != documents[order][:-1]]]
+
+            for docnum, score in zip(documents[first].tolist(), scores[first].tolist()):
+                if score > best_scores[query].get(docnum, -1.0):
+                    best_scores[query][docnum] = score
+
+        results = [sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k] for scores in best_scores]
+
+        return results, [np.array(sorted(scores), dtype=np.int32) for scores in best_scores]
+
+    def document(self, docnum):
+        return self.documents[docnum]
@@ -1,7 +1,12 @@
-from nltk.corpus import  stopwords
+from functools import lru_cache
+from nltk import tree
+from nltk.chunk import ne_chunker
+from nltk.tag import PerceptronTagger
 from whoosh.analysis import Filter, RegexTokenizer, LowercaseFilter, StopFilter
 from whoosh.fields import Schema, TEXT, ID
 
+import hashlib
+import re
 import sys
 import os
 import time
@@ -9,80 +14,168 @@ import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from file_helper import get_source_documents
-from word_helper import get_synonyms
+from analysis_helper import CachedAnalyzer
+from tokenizer_helper import stop_words
+from synonym_helper import NLTKSynonymFilter, synonym_mode, synonym_boost, base_analyzer, synonym_analyzer, analyzer, cached_analyzer
 
-class NLTKSynonymFilter(Filter):
-    def __call__(self, tokens):
-        for token in tokens:
-            yield token  # Retorna o token original
-            synonyms = get_synonyms(token.text)         
-            for synonym in synonyms:  # Obtém os sinônimos
-                new_token = token.copy()
-                new_token.text = synonym
-                yield new_token  # Retorna cada sinônimo como novo token
+sentence_end_pattern = re.compile(r'[.!?]')
+
+class SentenceTokenizer(RegexTokenizer):
+    """
+    RegexTokenizer that also numbers the sentence of each token in
+    token.sentence, starting a new one whenever the text between two tokens
+    has a '.', '!' or '?'. Filters downstream that drop tokens keep the
+    numbering of the ones left.
+    """
+
+    def __call__(self, value, chars=False, start_char=0, **kwargs):
+        sentence = 0
+        last_end = 0
+
+        for token in super().__call__(value, chars=True, start_char=start_char, **kwargs):
+            token_start = token.startchar - start_char
+
+            if sentence_end_pattern.search(value, last_end, token_start):
+                sentence += 1
+
+            token.sentence = sentence
+            last_end = token.endchar - start_char
+            yield token
+
+@lru_cache
+def get_entity_taggers():
+    # pos_tag/ne_chunk recarregam os modelos a cada chamada, aqui eles são carregados uma vez por processo
+    return PerceptronTagger(), ne_chunker()
+
+def tag_entities(sentences):
+    """
+    Named-entity label (or None) of every word of every sentence, tagging the
+    whole batch with one call to the POS tagger and the chunker.
+    """
+    tagger, chunker = get_entity_taggers()
+    labels = []
+
+    for chunks in chunker.parse_sents(tagger.tag_sents(sentences)):
+        sentence_labels = []
+
+        for chunk in chunks:
+            if isinstance(chunk, tree.Tree):
+                sentence_labels.extend([chunk.label()] * len(chunk.leaves()))
+            else:
+                sentence_labels.append(None)
 
-import nltk
-from nltk import ne_chunk, pos_tag, word_tokenize, tree
+        labels.append(sentence_labels)
+
+    return labels
+
+def split_sentences(tokens, max_sentence_tokens=100):
+    """
+    Group a token stream from SentenceTokenizer into lists of token copies,
+    one per sentence, splitting sentences longer than max_sentence_tokens.
+    """
+    sentence = []
+    current_sentence = None
+
+    for token in tokens:
+        token_sentence = getattr(token, 'sentence', None)
+
+        if sentence and (token_sentence != current_sentence or len(sentence) >= max_sentence_tokens):
+            yield sentence
+            sentence = []
+
+        current_sentence = token_sentence
+        # o tokenizer reaproveita o mesmo objeto Token, então é preciso copiar antes de acumular
+        sentence.append(token.copy())
+
+    if sentence:
+        yield sentence
 
 class NLTKNamedEntityFilter(Filter):
+    """
+    Sets token.ent_type on the tokens that are part of a named entity.
+
+    Tokens are tagged a sentence at a time, batch_sentences sentences per
+    tagger call, so memory stays proportional to the batch and each label
+    lines up with the token it came from.
+    """
+
+    cache_version = 1
+
+    def __init__(self, max_sentence_tokens=100, batch_sentences=32):
+        self.max_sentence_tokens = max_sentence_tokens
+        self.batch_sentences = batch_sentences
+
     def __call__(self, tokens):
-        token_list = list(tokens)
-        original_text = " ".join(t.text for t in token_list)
-        
-        nltk_tokens = word_tokenize(original_text)
-        pos_tags = pos_tag(nltk_tokens)
-        chunks = ne_chunk(pos_tags, binary=False)  
-        
-        ent_map = [None] * len(token_list)
-        
-        w_idx = 0
-        
-        def traverse_tree(chunks):
-            nonlocal w_idx
-            for chunk in chunks:
-                if isinstance(chunk, tree.Tree):
-                    ent_label = chunk.label()
-                    for leaf in chunk.leaves():
-                        if w_idx < len(ent_map):
-                            ent_map[w_idx] = ent_label
-                            w_idx += 1
-                else:
-                    if w_idx < len(ent_map):
-                        w_idx += 1
-        
-        traverse_tree(chunks)
-        
-        for i, tok in enumerate(token_list):
-            if ent_map[i] is not None:
-                tok.ent_type = ent_map[i]
-            yield tok
+        batch = []
 
+        for sentence in split_sentences(tokens, self.max_sentence_tokens):
+            batch.append(sentence)
 
-analyzer = (
-    RegexTokenizer() 
-    | LowercaseFilter() 
-    | StopFilter(stoplist=stopwords.words("english")) 
-    | NLTKSynonymFilter()
-)
+            if len(batch) >= self.batch_sentences:
+                yield from self.tag_batch(batch)
+                batch = []
+
+        if batch:
+            yield from self.tag_batch(batch)
+
+    def tag_batch(self, sentences):
+        for sentence, labels in zip(sentences, tag_entities([[token.text for token in sentence] for sentence in sentences])):
+            for token, label in zip(sentence, labels):
+                if label is not None:
+                    token.ent_type = label
+                yield token
 
 analyzer_named_entity = (
-    RegexTokenizer() 
+    SentenceTokenizer() 
     | LowercaseFilter() 
-    | StopFilter(stoplist=stopwords.words("english")) 
+    | StopFilter(stoplist=stop_words) 
     | NLTKNamedEntityFilter()
 )
 
-whoosh_schema = Schema(
-    id=ID(unique=True, stored=True),
-    title=TEXT(analyzer=analyzer, stored=True, field_boost=1.1),
-    content=TEXT(analyzer=analyzer, stored=True),
-    entity=TEXT(analyzer=analyzer_named_entity, stored=True, field_boost=1.5)
-)
+cached_analyzer_named_entity = CachedAnalyzer(analyzer_named_entity)
+
+def create_whoosh_schema(text_analyzer):
+    # título e texto ficam no document store (docstore_helper), o índice só guarda o id
+    return Schema(
+        id=ID(unique=True, stored=True),
+        content_hash=ID(stored=True),
+        title=TEXT(analyzer=text_analyzer, field_boost=1.1),
+        content=TEXT(analyzer=text_analyzer),
+        entity=TEXT(analyzer=cached_analyzer_named_entity, field_boost=1.5)
+    )
+
+whoosh_schema = create_whoosh_schema(cached_analyzer)
+
+whoosh_index_address = "whoosh-index" if synonym_mode == "index" else "whoosh-index-query-synonyms"
+es_index_name = "motor-1" if synonym_mode == "index" else "motor-1-query-synonyms"
+
+# mapeamento explícito usado pelo es_indexador; o conteúdo já chega analisado pelo Whoosh,
+# e os resultados são mostrados a partir do document store, então o _source não é guardado
+es_mappings = {
+    "_source": {"enabled": False},
+    "properties": {
+        "title": {"type": "text"},
+        "content": {"type": "text"},
+        "entity": {"type": "text"}
+    }
+}
+
+# muda quando a análise muda, para que a reindexação incremental refaça todos os documentos
+index_fingerprint = cached_analyzer.fingerprint + cached_analyzer_named_entity.fingerprint
+
+def document_hash(doc):
+    """
+    Hash of everything that goes into the indexed document: the text hash from
+    the corpus manifest, the title and the analyzers of the schema.
+    """
+    return hashlib.sha1(f"{index_fingerprint}\0{doc['content_hash']}\0{doc.get('title')}".encode('utf-8')).hexdigest()
 
-whoosh_index_address = "whoosh-index"
+def iter_documents_to_index(documents=None):
+    for doc in get_source_documents() if documents is None else documents:
+        yield {"id": doc['id'], "title": doc['title'], "content": doc['content'], "content_hash": document_hash(doc)}
 
 def get_documents_to_index():
-    return [{"id": doc['id'], "title": doc['title'], "content": doc['content']} for doc in get_source_documents()]
+    return list(iter_documents_to_index())
 
 if __name__ == '__main__':
     documents_to_index = [{"id": doc['id'], "title": doc['title'], "content": doc['content']} for doc in get_source_documents()]
@@ -91,7 +184,7 @@ if __name__ == '__main__':
     for idx, doc in enumerate(documents_to_index):
         start_time = time.perf_counter()
         
-        tokens = [token.text for token in analyzer(doc['content'])]
+        tokens = cached_analyzer.terms(doc['content'])
         
         end_time = time.perf_counter()
         times.append(end_time - start_time)
@@ -0,0 +1,137 @@
+from whoosh.index import open_dir
+from whoosh.scoring import BM25F
+from whoosh.qparser import MultifieldParser, OrGroup
+
+from analyzer import base_analyzer, whoosh_index_address, es_index_name, synonym_mode, synonym_boost
+from cache_helper import QueryResultCache, VersionCheck, cache_key, normalize_query, es_index_version, query_cache_file, query_cache_size, query_cache_ttl
+from es_buscador import build_search_query
+from docstore_helper import document_store_address, document_store_version, get_block_store
+from es_helper import get_client
+from query_helper import whoosh_bigram_query, whoosh_synonym_query
+from service_helper import SearchServer
+from whoosh_helper import SearcherPool
+
+import argparse
+import os
+import sys
+
+def render_hits(ranking, terms, document_store):
+    """
+    Result dicts of (id, score) pairs, with the title and a snippet around
+    the query terms read from the document store.
+    """
+    return [
+        {"id": doc_id, "title": document_store.title(doc_id), "score": score, "snippet": document_store.snippet(doc_id, terms)}
+        for doc_id, score in ranking
+    ]
+
+search_fields = ["title", "content", "entity"]
+
+def whoosh_engine(ix, result_cache, check_interval=1.0):
+    """
+    Search function over a pool of warm Whoosh searchers, built from all the
+    bigrams of the query like whoosh_buscador.py --mode combined. Rankings
+    are cached until the index gets a new commit; titles and snippets are
+    rendered on every request from the document store, reopened when it is
+    rebuilt.
+    """
+    pool = SearcherPool(ix, check_interval, weighting=BM25F)
+    multifield_parser = MultifieldParser(search_fields, ix.schema, group=OrGroup)
+    store_version = VersionCheck(document_store_version, check_interval)
+
+    def search(query_term, limit):
+        tokens = [token.text for token in base_analyzer(query_term)]
+        key = cache_key("whoosh", whoosh_index_address, "ranking", normalize_query(query_term), search_fields, "BM25F", synonym_mode, limit)
+        version = f"whoosh:{pool.current_generation()}"
+        ranking = result_cache.get_or_compute(key, version, lambda: run_search(tokens, limit))[0]
+
+        return render_hits(ranking, tokens, get_block_store(version=store_version()))
+
+    def run_search(tokens, limit):
+        query = whoosh_bigram_query(multifield_parser, search_fields, tokens)
+
+        if synonym_mode == "query":
+            # o campo entity não passa pelo filtro de sinônimos nem na indexação
+            query = query | whoosh_synonym_query(["title", "content"], tokens, synonym_boost)
+
+        with pool.searcher() as searcher:
+            return [(hit["id"], hit.score) for hit in searcher.search(query, limit=limit)]
+
+    return search, pool
+
+def es_engine(es, result_cache, check_interval=1.0):
+    """
+    Search function over the pooled Elasticsearch client. Rankings are
+    cached until the alias points to another index, and rendered from the
+    document store like in whoosh_engine.
+    """
+    index_version = VersionCheck(lambda: es_index_version(es, es_index_name), check_interval)
+    store_version = VersionCheck(document_store_version, check_interval)
+
+    def search(query_term, limit):
+        # a consulta montada já carrega os campos e os pesos usados
+        query_term = normalize_query(query_term)
+        key = cache_key("es", es_index_name, "ranking", build_search_query(query_term), limit)
+        ranking = result_cache.get_or_compute(key, index_version(), lambda: run_search(query_term, limit))[0]
+
+        return render_hits(ranking, [token.text for token in base_analyzer(query_term)], get_block_store(version=store_version()))
+
+    def run_search(query_term, limit):
+        search_query = build_search_query(query_term)
+        search_query["size"] = limit
+
+        response = es.search(index=es_index_name, body=search_query)
+
+        return [(hit["_id"], hit["_score"]) for hit in response["hits"]["hits"]]
+
+    return search
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serviço de busca com searcher do Whoosh e cliente do Elasticsearch sempre abertos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--engines", nargs="+", choices=["whoosh", "es"], default=["whoosh"])
+    parser.add_argument("--es-host", default="http://localhost:9200")
+    parser.add_argument("--es-pool", type=int, default=10, help="conexões mantidas com o Elasticsearch")
+    parser.add_argument("--check-interval", type=float, default=1.0, help="segundos entre verificações de um novo commit do índice Whoosh ou de troca do alias do Elasticsearch")
+    parser.add_argument("--cache-size", type=int, default=query_cache_size, help="consultas mantidas no cache de resultados (0 desliga o cache em memória)")
+    parser.add_argument("--cache-ttl", type=float, default=query_cache_ttl, help="segundos que um resultado fica no cache")
+    parser.add_argument("--cache-file", default=query_cache_file, help="arquivo sqlite que guarda os resultados entre execuções")
+    parser.add_argument("--max-limit", type=int, default=100, help="maior limit aceito por requisição")
+    parser.add_argument("--verbose", action="store_true", help="registra cada requisição")
+    args = parser.parse_args()
+
+    if not os.path.exists(document_store_address):
+        print("Document store não encontrado, execute o whoosh_indexador.py ou o es_indexador.py primeiro")
+        sys.exit(1)
+
+    engines = {}
+    pool = None
+    result_cache = QueryResultCache(max_entries=args.cache_size, ttl=args.cache_ttl, path=args.cache_file)
+
+    if "whoosh" in args.engines:
+        if not os.path.exists(whoosh_index_address):
+            print("Índice não encontrado, execute o whoosh_indexador.py primeiro")
+            sys.exit(1)
+
+        engines["whoosh"], pool = whoosh_engine(open_dir(whoosh_index_address), result_cache, args.check_interval)
+
+    if "es" in args.engines:
+        engines["es"] = es_engine(get_client(args.es_host, maxsize=args.es_pool), result_cache, args.check_interval)
+
+    def health():
+        return {"cache": result_cache.stats(), **({"whoosh_generation": pool.generation} if pool else {})}
+
+    server = SearchServer((args.host, args.port), engines, default_engine=args.engines[0], health=health, verbose=args.verbose, max_limit=args.max_limit)
+
+    print(f"Servindo {', '.join(engines)} em http://{args.host}:{args.port}/search?q=...")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Encerrando o serviço...")
+    finally:
+        server.server_close()
+
+        if pool:
+            pool.close()
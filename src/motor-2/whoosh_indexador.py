@@ -1,34 +1,121 @@
-from whoosh import index
-from analyzer import whoosh_schema as schema, whoosh_index_address, get_documents_to_index
+from whoosh import index, writing
+from analyzer import whoosh_schema as schema, whoosh_index_address, iter_documents_to_index, document_hash
+from file_helper import get_source_documents
+from whoosh_helper import analyzer_fingerprints, indexed_content_hashes
+from docstore_helper import update_document_store
 
+import argparse
 import os
 import time
 
+merge_policies = {
+    "optimize": writing.OPTIMIZE,
+    "small": writing.MERGE_SMALL,
+    "none": writing.NO_MERGE
+}
+
+parser = argparse.ArgumentParser(description="Indexa os documentos fonte no Whoosh")
+parser.add_argument("--procs", type=int, default=1, help="processos que analisam e gravam segmentos em paralelo (1 = serial)")
+parser.add_argument("--limitmb", type=int, default=128, help="memória máxima em MB do buffer de cada processo escritor")
+parser.add_argument("--batchsize", type=int, default=100, help="documentos enviados por vez a cada processo")
+parser.add_argument("--merge", choices=list(merge_policies), help="política de merge no commit: optimize junta tudo em um segmento, small só os segmentos pequenos (padrão: optimize, ou small com --incremental)")
+parser.add_argument("--incremental", action="store_true", help="reaproveita o índice existente e só reindexa os documentos novos, alterados ou removidos")
+args = parser.parse_args()
+
 # Criando o índice
 if not os.path.exists(whoosh_index_address):
     os.mkdir(whoosh_index_address)
 
-ix = index.create_in(whoosh_index_address, schema)
+# índices antigos sem o campo content_hash, ou que ainda guardam título e texto, precisam ser recriados;
+# o índice também analisa com o schema guardado nele, então outro analisador ou outra tabela de sinônimos
+# obrigam a recriar, senão os documentos alterados seriam reanalisados com a cadeia antiga
+incremental = False
 
-#extract id, title and content
-documents_to_index = get_documents_to_index()
+if args.incremental and index.exists_in(whoosh_index_address):
+    ix = index.open_dir(whoosh_index_address)
+    incremental = sorted(ix.schema.stored_names()) == sorted(schema.stored_names()) and analyzer_fingerprints(ix.schema) == analyzer_fingerprints(schema)
+
+    # o índice aberto só para ver o schema é fechado antes de ser recriado
+    if not incremental:
+        ix.close()
+
+if args.incremental and not incremental:
+    print("Índice inexistente, com outro schema ou com outra análise (analisador ou sinônimos), recriando do zero...")
+
+merge = args.merge or ("small" if incremental else "optimize")
+total_start_time = time.time()
+
+# os resultados mostram título e trechos a partir do document store, refeito só quando o corpus muda
+print("Atualizando o document store...")
+
+if not update_document_store(procs=args.procs):
+    print("Document store sem alterações")
+
+if incremental:
+    with ix.reader() as reader:
+        indexed_hashes = indexed_content_hashes(reader)
+
+    source_documents = list(get_source_documents())
+    source_ids = {doc['id'] for doc in source_documents}
+
+    # só o manifesto é consultado aqui; o texto é lido apenas dos documentos que mudaram
+    documents = [doc for doc in source_documents if indexed_hashes.get(doc['id']) != document_hash(doc)]
+    removed_ids = [doc_id for doc_id in indexed_hashes if doc_id not in source_ids]
+
+    print(f"{len(source_documents) - len(documents)} documentos sem alteração, {len(documents)} novos ou alterados, {len(removed_ids)} removidos")
+else:
+    ix = index.create_in(whoosh_index_address, schema)
+    documents = None
+    removed_ids = []
+
+documents_count = len(documents) if incremental else sum(1 for _ in get_source_documents())
 
-start_time = time.time()
 times = []
-print(f"Indexando {len(documents_to_index)} documentos, aguarde...")
+print(f"Indexando {documents_count} documentos com {args.procs} processo(s), aguarde...")
+
+if args.procs > 1:
+    # cada processo grava o próprio segmento; juntar as runs no processo principal
+    # (multisegment=False) soma os tamanhos de campo de forma diferente do caminho serial
+    writer = ix.writer(procs=args.procs, limitmb=args.limitmb, batchsize=args.batchsize, multisegment=True)
+else:
+    writer = ix.writer(limitmb=args.limitmb)
 
-writer = ix.writer()
+for doc_id in removed_ids:
+    writer.delete_by_term("id", doc_id)
 
-for idx, doc in enumerate(documents_to_index):
+#extract id, title and content
+for idx, doc in enumerate(iter_documents_to_index(documents)):
     start_time = time.perf_counter()
-    writer.add_document(**doc)    
-    end_time = time.perf_counter()
-    times.append(end_time - start_time)
-    print(f"Indexado documento {doc['id']} em {times[len(times) - 1]:.4f} segundos ({(idx + 1) / len(documents_to_index) * 100:.2f}%)")
 
-writer.commit(optimize=True)
+    if incremental:
+        # substitui a versão anterior do documento, se houver
+        writer.update_document(**doc)
+    else:
+        writer.add_document(**doc)
+
+    progress = f"({(idx + 1) / documents_count * 100:.2f}%)"
+
+    if args.procs > 1:
+        # aqui o documento só entra na fila dos processos escritores, então só o tempo total vale
+        print(f"Enviado documento {doc['id']} aos processos escritores {progress}")
+        continue
+
+    times.append(time.perf_counter() - start_time)
+    print(f"Indexado documento {doc['id']} em {times[-1]:.4f} segundos {progress}")
+
+print(f"Finalizando o índice (merge: {merge})...")
+
+if args.procs > 1:
+    # os segmentos dos subprocessos só entram no índice depois do commit, então o merge é um segundo passo
+    writer.commit(mergetype=writing.NO_MERGE)
+
+    if merge != "none":
+        ix.writer(limitmb=args.limitmb).commit(mergetype=merge_policies[merge])
+else:
+    writer.commit(mergetype=merge_policies[merge])
 
 print(f"Documentos indexados com sucesso!")
-print(f"Tempo total de indexação: {time.time() - start_time:.4f} segundos")
-print(f"Tempo médio de indexação: {sum(times) / len(times):.4f} segundos")
+print(f"Tempo total de indexação: {time.time() - total_start_time:.4f} segundos")
 
+if times:
+    print(f"Tempo médio de indexação: {sum(times) / len(times):.4f} segundos")
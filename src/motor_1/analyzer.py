@@ -1,7 +1,6 @@
-from nltk.corpus import  stopwords
-from whoosh.analysis import Filter, RegexTokenizer, LowercaseFilter, StopFilter
 from whoosh.fields import Schema, TEXT, ID
 
+import hashlib
 import sys
 import os
 import time
@@ -9,35 +8,48 @@ import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from file_helper import get_source_documents
-from word_helper import get_synonyms
-
-class NLTKSynonymFilter(Filter):
-    def __call__(self, tokens):
-        for token in tokens:
-            yield token  # Retorna o token original
-            synonyms = get_synonyms(token.text)         
-            for synonym in synonyms:  # Obtém os sinônimos
-                new_token = token.copy()
-                new_token.text = synonym
-                yield new_token  # Retorna cada sinônimo como novo token
-
-analyzer = (
-    RegexTokenizer() 
-    | LowercaseFilter() 
-    | StopFilter(stoplist=stopwords.words("english")) 
-    | NLTKSynonymFilter()
-)
-
-whoosh_schema = Schema(
-    id=ID(unique=True, stored=True),
-    title=TEXT(analyzer=analyzer, stored=True, field_boost=1.1),
-    content=TEXT(analyzer=analyzer, stored=True)
-)
-
-whoosh_index_address = "whoosh-index"
+from synonym_helper import NLTKSynonymFilter, synonym_mode, synonym_boost, base_analyzer, synonym_analyzer, analyzer, cached_analyzer
+
+def create_whoosh_schema(text_analyzer):
+    # título e texto ficam no document store (docstore_helper), o índice só guarda o id
+    return Schema(
+        id=ID(unique=True, stored=True),
+        content_hash=ID(stored=True),
+        title=TEXT(analyzer=text_analyzer, field_boost=1.1),
+        content=TEXT(analyzer=text_analyzer)
+    )
+
+whoosh_schema = create_whoosh_schema(cached_analyzer)
+
+whoosh_index_address = "whoosh-index" if synonym_mode == "index" else "whoosh-index-query-synonyms"
+es_index_name = "motor-1" if synonym_mode == "index" else "motor-1-query-synonyms"
+
+# mapeamento explícito usado pelo es_indexador; o conteúdo já chega analisado pelo Whoosh,
+# e os resultados são mostrados a partir do document store, então o _source não é guardado
+es_mappings = {
+    "_source": {"enabled": False},
+    "properties": {
+        "title": {"type": "text"},
+        "content": {"type": "text"}
+    }
+}
+
+# muda quando a análise muda, para que a reindexação incremental refaça todos os documentos
+index_fingerprint = cached_analyzer.fingerprint
+
+def document_hash(doc):
+    """
+    Hash of everything that goes into the indexed document: the text hash from
+    the corpus manifest, the title and the analyzers of the schema.
+    """
+    return hashlib.sha1(f"{index_fingerprint}\0{doc['content_hash']}\0{doc.get('title')}".encode('utf-8')).hexdigest()
+
+def iter_documents_to_index(documents=None):
+    for doc in get_source_documents() if documents is None else documents:
+        yield {"id": doc['id'], "title": doc['title'], "content": doc['content'], "content_hash": document_hash(doc)}
 
 def get_documents_to_index():
-    return [{"id": doc['id'], "title": doc['title'], "content": doc['content']} for doc in get_source_documents()]
+    return list(iter_documents_to_index())
 
 if __name__ == '__main__':
     documents_to_index = [{"id": doc['id'], "title": doc['title'], "content": doc['content']} for doc in get_source_documents()]
@@ -46,7 +58,7 @@ if __name__ == '__main__':
     for idx, doc in enumerate(documents_to_index):
         start_time = time.perf_counter()
         
-        tokens = [token.text for token in analyzer(doc['content'])]
+        tokens = cached_analyzer.terms(doc['content'])
         
         end_time = time.perf_counter()
         times.append(end_time - start_time)
@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from whoosh.index import open_dir
+from whoosh.scoring import BM25F
+from whoosh.qparser import MultifieldParser, OrGroup
+
+from analyzer import base_analyzer, whoosh_index_address, es_index_name, synonym_mode, synonym_boost
+from cache_helper import QueryResultCache, cache_key, es_index_version, whoosh_index_version, query_cache_file
+from es_buscador import build_search_query
+from es_helper import get_client
+from evaluation_helper import query_terms, evaluate_rankings, latency_summary, write_report
+from file_helper import get_document_store, get_suspicious_documents, get_document_by_id
+from pool_helper import map_ordered
+from query_helper import whoosh_synonym_query
+
+import argparse
+import os
+import sys
+import time
+
+search_fields = ["title", "content"]
+
+k = [2,4,6,8,10]
+
+def suspicious_query(doc, max_terms):
+    return query_terms([token.text for token in base_analyzer(doc['content'])], max_terms)
+
+# um searcher por processo, aberto na primeira consulta e reaproveitado pelas seguintes
+whoosh_searcher = None
+whoosh_parser = None
+whoosh_version = None
+
+# sem arquivo, o cache não guarda nada entre execuções e cada consulta é única
+result_cache = None
+
+def cached_search(key, version, search):
+    """
+    Run search through the result cache and return (ids, latency, whether it was cached).
+    """
+    start_time = time.perf_counter()
+
+    if result_cache is None:
+        ids, cached = search(), False
+    else:
+        ids, cached = result_cache.get_or_compute(key, version, search)
+
+    return ids, time.perf_counter() - start_time, cached
+
+def whoosh_search(doc, max_terms=30, limit=10):
+    global whoosh_searcher, whoosh_parser, whoosh_version
+
+    if whoosh_searcher is None:
+        ix = open_dir(whoosh_index_address)
+        whoosh_searcher = ix.searcher(weighting=BM25F)
+        whoosh_parser = MultifieldParser(search_fields, ix.schema, group=OrGroup)
+        whoosh_version = whoosh_index_version(ix)
+
+    terms = suspicious_query(doc, max_terms)
+    key = cache_key("whoosh", whoosh_index_address, terms, search_fields, "BM25F", synonym_mode, limit)
+
+    return cached_search(key, whoosh_version, partial(run_whoosh_search, terms, limit))
+
+def run_whoosh_search(terms, limit):
+    query = whoosh_parser.parse(" ".join(terms))
+
+    if synonym_mode == "query":
+        query = query | whoosh_synonym_query(search_fields, terms, synonym_boost)
+
+    results = whoosh_searcher.search(query, limit=limit)
+
+    return [hit["id"] for hit in results]
+
+def es_search(es, version, doc, max_terms=30, limit=10):
+    terms = suspicious_query(doc, max_terms)
+    # a mesma consulta do es_buscador, para a avaliação medir o que o motor faz
+    body = build_search_query(" ".join(terms))
+    body["size"] = limit
+    body["_source"] = False
+
+    def run_search():
+        response = es.search(index=es_index_name, body=body)
+        return [hit["_id"] for hit in response["hits"]["hits"]]
+
+    return cached_search(cache_key("es", es_index_name, body), version, run_search)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Avalia a recuperação das fontes de todos os documentos suspeitos")
+    parser.add_argument("--engine", choices=["whoosh", "es"], default="whoosh")
+    parser.add_argument("--es-host", default="http://localhost:9200")
+    parser.add_argument("--procs", type=int, default=1, help="processos que consultam o Whoosh, cada um com o próprio searcher")
+    parser.add_argument("--threads", type=int, default=4, help="consultas simultâneas ao Elasticsearch")
+    parser.add_argument("--max-terms", type=int, default=30, help="termos mais frequentes do documento suspeito usados na consulta")
+    parser.add_argument("--limit", type=int, default=max(k), help="resultados por consulta, também a profundidade do MAP")
+    parser.add_argument("--max-queries", type=int, help="avalia só os primeiros documentos suspeitos")
+    parser.add_argument("--validate-corpus", action="store_true", help="confere o tamanho e a data de cada arquivo do corpus com o manifesto antes de começar")
+    parser.add_argument("--cache-file", default=query_cache_file, help="arquivo sqlite com os resultados das execuções anteriores; só as consultas novas ou de um índice alterado são refeitas")
+    parser.add_argument("--output", help="arquivo do relatório JSON (padrão: avaliacao-<engine>.json)")
+    args = parser.parse_args()
+
+    if args.engine == "whoosh" and not os.path.exists(whoosh_index_address):
+        print("Índice não encontrado, execute o whoosh_indexador.py primeiro")
+        sys.exit(1)
+
+    if args.cache_file:
+        result_cache = QueryResultCache(path=args.cache_file)
+
+    # só leitura: o manifesto do corpus é carregado sem conferir cada arquivo, a não ser com --validate-corpus
+    get_document_store(validate=args.validate_corpus)
+
+    suspicious_documents = list(get_suspicious_documents())[:args.max_queries]
+    limit = max(args.limit, max(k))
+
+    print(f"Consultando {len(suspicious_documents)} documentos suspeitos no {args.engine}, aguarde...")
+
+    start_time = time.perf_counter()
+
+    if args.engine == "whoosh":
+        results = list(map_ordered(partial(whoosh_search, max_terms=args.max_terms, limit=limit), suspicious_documents, args.procs))
+    else:
+        es = get_client(args.es_host, maxsize=args.threads)
+
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            results = list(executor.map(partial(es_search, es, es_index_version(es, es_index_name), max_terms=args.max_terms, limit=limit), suspicious_documents))
+
+    elapsed = time.perf_counter() - start_time
+
+    # os resultados vêm com o id do índice; o gabarito usa o nome do arquivo fonte
+    retrieved = [[document['filename'] for document in map(get_document_by_id, ids) if document is not None] for ids, _, _ in results]
+    relevant = [doc.get('src_file', []) for doc in suspicious_documents]
+
+    report = {
+        "engine": args.engine,
+        "index": whoosh_index_address if args.engine == "whoosh" else es_index_name,
+        "synonym_mode": synonym_mode,
+        "max_terms": args.max_terms,
+        "cached_queries": sum(cached for _, _, cached in results),
+        **latency_summary([latency for _, latency, _ in results], elapsed),
+        **evaluate_rankings(retrieved, relevant, k, depth=limit)
+    }
+
+    output = args.output or f"avaliacao-{args.engine}.json"
+    write_report(output, report)
+
+    print(f"Consultas por segundo: {report.get('queries_per_second') or 0:.2f}")
+
+    for key in k:
+        print(f"P@{key}: {report.get('precision_at_k', {}).get(str(key), 0):.4f}  R@{key}: {report.get('recall_at_k', {}).get(str(key), 0):.4f}")
+
+    print(f"MAP@{limit}: {report.get('map', 0):.4f}")
+    print(f"Relatório salvo em {output}")
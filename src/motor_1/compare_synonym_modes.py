@@ -0,0 +1,93 @@
+from whoosh import index
+from whoosh.scoring import BM25F
+from whoosh.qparser import MultifieldParser, OrGroup
+
+from analyzer import base_analyzer, synonym_analyzer, synonym_boost, create_whoosh_schema, get_documents_to_index
+from query_helper import whoosh_synonym_query
+from word_helper import get_synonyms
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# uso: python compare_synonym_modes.py [quantidade de documentos] [quantidade de consultas]
+max_documents = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+max_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+search_fields = ["title", "content"]
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, file_name)) for file_name in os.listdir(path))
+
+def sample_queries(documents, count):
+    """
+    Pick count random bigrams from the corpus itself, like the ones whoosh_buscador.py runs.
+    """
+    random.seed(42)
+    queries = []
+
+    for doc in random.sample(documents, min(count, len(documents))):
+        tokens = [token.text for token in base_analyzer(doc['content'])]
+
+        if len(tokens) >= 2:
+            idx = random.randrange(len(tokens) - 1)
+            queries.append(tokens[idx:idx + 2])
+
+    return queries
+
+def run_mode(mode, text_analyzer, documents, queries):
+    address = tempfile.mkdtemp(prefix=f"whoosh-{mode}-")
+    # sem isso o segundo modo aproveitaria os sinônimos já consultados pelo primeiro
+    get_synonyms.cache_clear()
+
+    try:
+        ix = index.create_in(address, create_whoosh_schema(text_analyzer))
+
+        start_time = time.perf_counter()
+        writer = ix.writer()
+
+        for doc in documents:
+            writer.add_document(**doc)
+
+        writer.commit(optimize=True)
+        indexing_time = time.perf_counter() - start_time
+
+        times = []
+
+        with ix.searcher(weighting=BM25F) as searcher:
+            multifield_parser = MultifieldParser(search_fields, ix.schema, group=OrGroup)
+
+            for query_tokens in queries:
+                start_time = time.perf_counter()
+                query = multifield_parser.parse(" ".join(query_tokens))
+
+                if mode == "query":
+                    query = query | whoosh_synonym_query(search_fields, query_tokens, synonym_boost)
+
+                searcher.search(query)
+                times.append(time.perf_counter() - start_time)
+
+        return indexing_time, directory_size(address), sorted(times)
+    finally:
+        shutil.rmtree(address)
+
+if __name__ == '__main__':
+    documents_to_index = get_documents_to_index()[:max_documents]
+    queries = sample_queries(documents_to_index, max_queries)
+
+    print(f"Comparando modos de sinônimos com {len(documents_to_index)} documentos e {len(queries)} consultas...")
+
+    for mode, text_analyzer in (("index", synonym_analyzer), ("query", base_analyzer)):
+        indexing_time, size, times = run_mode(mode, text_analyzer, documents_to_index, queries)
+
+        print(f"Modo {mode}:")
+        print(f"  Tamanho do índice: {size / 1024 / 1024:.2f} MB")
+        print(f"  Tempo de indexação: {indexing_time:.4f} segundos")
+
+        if times:
+            print(f"  Latência média: {sum(times) / len(times) * 1000:.2f} ms")
+            print(f"  Latência p50: {times[len(times) // 2] * 1000:.2f} ms")
+            print(f"  Latência p95: {times[min(len(times) - 1, int(len(times) * 0.95))] * 1000:.2f} ms")
@@ -1,8 +1,10 @@
-from elasticsearch import Elasticsearch
+from analyzer import base_analyzer, es_index_name, synonym_mode, synonym_boost
+from cache_helper import QueryResultCache, VersionCheck, cache_key, normalize_query, es_index_version
+from docstore_helper import get_block_store
+from es_helper import get_client, get_async_client, msearch, msearch_async
+from query_helper import es_synonym_clauses
 
-def search_documents(query_term, es_host="http://localhost:9200", index_name="motor-1"):
-    es = Elasticsearch([es_host])
-    
+def build_search_query(query_term):
     search_query = {
         "query": {
             "match": {
@@ -11,22 +13,109 @@ def search_documents(query_term, es_host="http://localhost:9200", index_name="mo
         }
     }
     
-    response = es.search(index=index_name, body=search_query)
+    if synonym_mode == "query":
+        tokens = [token.text for token in base_analyzer(query_term)]
+        search_query["query"] = {
+            "bool": {
+                "should": [
+                    {"match": {"content": query_term}},
+                    *es_synonym_clauses(["content"], tokens, synonym_boost)
+                ]
+            }
+        }
+    
+    return search_query
+
+result_cache = QueryResultCache()
+index_versions = {}
+
+def index_version(es, es_host, index_name):
+    if (es_host, index_name) not in index_versions:
+        index_versions[(es_host, index_name)] = VersionCheck(lambda: es_index_version(es, index_name))
+    
+    return index_versions[(es_host, index_name)]()
+
+def search_documents(query_term, es_host="http://localhost:9200", index_name=es_index_name):
+    es = get_client(es_host)
+    search_query = build_search_query(normalize_query(query_term))
+    
+    response, _ = result_cache.get_or_compute(
+        cache_key("es", es_host, index_name, search_query),
+        index_version(es, es_host, index_name),
+        lambda: es.search(index=index_name, body=search_query)
+    )
     
     return response
 
+def search_many(query_terms, es_host="http://localhost:9200", index_name=es_index_name, batch_size=100):
+    """
+    Responses of many searches, in order. Those not in the result cache are
+    sent batch_size at a time in _msearch requests.
+    """
+    es = get_client(es_host)
+    version = index_version(es, es_host, index_name)
+    search_queries, keys, responses, missing = cached_responses(query_terms, es_host, index_name, version)
+    
+    fetched = msearch(es, index_name, [search_queries[idx] for idx in missing], batch_size)
+    
+    return store_responses(keys, version, responses, missing, fetched)
+
+def cached_responses(query_terms, es_host, index_name, version):
+    """
+    Search bodies and cache keys of the queries, their cached responses
+    (None when not cached) and the positions of the missing ones.
+    """
+    search_queries = [build_search_query(normalize_query(query_term)) for query_term in query_terms]
+    keys = [cache_key("es", es_host, index_name, search_query) for search_query in search_queries]
+    responses = [result_cache.get(key, version)[1] for key in keys]
+    
+    return search_queries, keys, responses, [idx for idx, response in enumerate(responses) if response is None]
+
+def store_responses(keys, version, responses, missing, fetched):
+    for idx, response in zip(missing, fetched):
+        # buscas que falharam não vão para o cache
+        if "error" not in response:
+            result_cache.put(keys[idx], version, response)
+        
+        responses[idx] = response
+    
+    return responses
+
+async def search_documents_async(query_term, es_host="http://localhost:9200", index_name=es_index_name):
+    """
+    search_documents over the async client, through the same result cache.
+    """
+    return (await search_many_async([query_term], es_host, index_name))[0]
+
+async def search_many_async(query_terms, es_host="http://localhost:9200", index_name=es_index_name, batch_size=100, concurrency=4):
+    """
+    search_many over the async client, with up to concurrency _msearch
+    requests in flight. Uses the same result cache as the sync functions;
+    the index version is read with the pooled sync client, at most once per
+    check interval.
+    """
+    version = index_version(get_client(es_host), es_host, index_name)
+    search_queries, keys, responses, missing = cached_responses(query_terms, es_host, index_name, version)
+    
+    fetched = await msearch_async(get_async_client(es_host), index_name, [search_queries[idx] for idx in missing], batch_size, concurrency) if missing else []
+    
+    return store_responses(keys, version, responses, missing, fetched)
+
 if __name__ == "__main__":
     user_query = input("Digite um termo de busca: ")
     
     results = search_documents(user_query)
     
+    # o índice não guarda o _source; título e trecho vêm do document store
+    document_store = get_block_store()
+    terms = [token.text for token in base_analyzer(user_query)]
+    
     print("Resultados da busca:")
     for hit in results["hits"]["hits"]:
         doc_id = hit["_id"]
-        title = hit["_source"].get("title", "Sem título")
-        content = hit["_source"].get("content", "")
+        title = document_store.title(doc_id) or "Sem título"
         score = hit["_score"]
         print(f"ID: {doc_id}, Score: {score}")
         print(f"Título: {title}")
-        print(f"Conteúdo: {content[:200]}...")
+        print(f"Trecho: {document_store.snippet(doc_id, terms)}...")
         print("-" * 50)
\ No newline at end of file
@@ -1,38 +1,93 @@
-from elasticsearch import Elasticsearch, helpers
-from analyzer import analyzer, get_documents_to_index
+from elasticsearch import Elasticsearch
+from functools import partial
+from analyzer import cached_analyzer, iter_documents_to_index, es_index_name, es_mappings
+from docstore_helper import update_document_store
+from es_helper import bulk_index, create_ingest_index, finish_ingest_index, swap_alias
+from pool_helper import map_ordered
 
+import argparse
+import sys
 import time
 
 def preprocess_with_whoosh_analyzer(text):
-    return " ".join([t.text for t in analyzer(text)])
+    return " ".join(cached_analyzer.terms(text))
 
-# Exemplo de uso
-documents_to_index = get_documents_to_index()
-
-print("Conectando ao servidor Elasticsearch...")
-
-# Conectando ao Elasticsearch
-es = Elasticsearch(["http://localhost:9200"])
-
-print("Conexão estabelecida, indexando documentos...")
-
-start_time = time.perf_counter()
-
-actions = [
-    {
-        "_index": "motor-1",
+def create_action(doc, index_name=es_index_name):
+    return {
+        "_index": index_name,
         "_id": doc["id"],
         "_source": {
             "title": doc["title"],
             "content": preprocess_with_whoosh_analyzer(doc["content"])
         }
     }
-    for doc in documents_to_index
-]
 
-print("Fazendo a indexação....")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Indexa os documentos fonte no Elasticsearch")
+    parser.add_argument("--es-host", default="http://localhost:9200")
+    parser.add_argument("--procs", type=int, default=1, help="processos que rodam o analisador do Whoosh")
+    parser.add_argument("--threads", type=int, default=1, help="requisições _bulk simultâneas")
+    parser.add_argument("--chunk-size", type=int, default=500, help="máximo de documentos por requisição _bulk")
+    parser.add_argument("--chunk-mb", type=float, default=100, help="máximo de MB por requisição _bulk")
+    parser.add_argument("--max-retries", type=int, default=5, help="novas tentativas para documentos (ou requisições) rejeitados com 429")
+    parser.add_argument("--initial-backoff", type=float, default=2, help="espera inicial em segundos entre tentativas, dobrada a cada nova tentativa")
+    parser.add_argument("--replicas", type=int, default=1, help="réplicas restauradas depois da carga")
+    parser.add_argument("--no-force-merge", action="store_true", help="não junta o índice em um único segmento depois da carga")
+    args = parser.parse_args()
+
+    print("Conectando ao servidor Elasticsearch...")
+
+    # Conectando ao Elasticsearch
+    es = Elasticsearch([args.es_host], maxsize=args.threads)
+
+    print("Conexão estabelecida, indexando documentos...")
+
+    start_time = time.perf_counter()
+
+    # o _source não é guardado, os resultados mostram título e trechos a partir do document store
+    print("Atualizando o document store...")
+
+    if not update_document_store(procs=args.procs):
+        print("Document store sem alterações")
+
+    # a carga vai para um índice novo; o alias só passa a apontar para ele no final
+    index_name = create_ingest_index(es, es_index_name, es_mappings)
+
+    print(f"Índice {index_name} criado para a carga")
+
+    try:
+        # as ações são geradas sob demanda, conforme os lotes anteriores são enviados
+        actions = map_ordered(partial(create_action, index_name=index_name), iter_documents_to_index(), args.procs)
+
+        print("Fazendo a indexação....")
+
+        indexed, errors = bulk_index(
+            es,
+            actions,
+            threads=args.threads,
+            chunk_size=args.chunk_size,
+            max_chunk_bytes=int(args.chunk_mb * 1024 * 1024),
+            max_retries=args.max_retries,
+            initial_backoff=args.initial_backoff
+        )
+
+        for error in errors[:10]:
+            print(f"Erro ao indexar: {error}")
+
+        if errors:
+            print(f"{len(errors)} documentos não foram indexados, o alias {es_index_name} continua no índice anterior e {index_name} é removido")
+            es.indices.delete(index=index_name)
+            sys.exit(1)
+
+        print("Restaurando as configurações de busca do índice...")
 
-response = helpers.bulk(es, actions)
+        finish_ingest_index(es, index_name, replicas=args.replicas, force_merge=not args.no_force_merge)
+        swap_alias(es, es_index_name, index_name)
+    except (Exception, KeyboardInterrupt):
+        # um índice pela metade, sem refresh e sem réplicas, não fica para trás
+        print(f"Carga interrompida, removendo o índice {index_name}")
+        es.indices.delete(index=index_name)
+        raise
 
-print(f"Documentos indexados com sucesso!")
-print(f"Tempo total de indexação: {time.perf_counter() - start_time:.4f} segundos")
\ No newline at end of file
+    print(f"Documentos indexados com sucesso! ({indexed} indexados, alias {es_index_name} -> {index_name})")
+    print(f"Tempo total de indexação: {time.perf_counter() - start_time:.4f} segundos")
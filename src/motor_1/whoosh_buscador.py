@@ -1,26 +1,39 @@
 from nltk.util import bigrams
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 
 from whoosh.index import open_dir
 
-from whoosh.scoring import BM25F 
+from whoosh.scoring import BM25F
 from whoosh.qparser import MultifieldParser, OrGroup
 
-from analyzer import whoosh_index_address
+from concurrent.futures import ThreadPoolExecutor
+from analyzer import whoosh_index_address, synonym_mode, synonym_boost
+from docstore_helper import document_store_address, get_block_store
+from whoosh_helper import SearcherPool
+from cache_helper import QueryResultCache, cache_key, whoosh_index_version, query_cache_file
+from tokenizer_helper import tokenize
+from query_helper import whoosh_synonym_query, whoosh_bigram_query, reciprocal_rank_fusion
 
+import argparse
 import os
 import time
 
-if not os.path.exists(whoosh_index_address):
+parser = argparse.ArgumentParser(description="Busca no índice Whoosh")
+parser.add_argument("--mode", choices=["combined", "rrf", "bigram"], default="combined", help="combined: uma consulta com todos os bigramas; rrf: uma busca por bigrama em paralelo, fundidas por reciprocal rank fusion; bigram: uma busca por bigrama, resultados separados")
+parser.add_argument("--limit", type=int, default=10, help="resultados retornados")
+parser.add_argument("--phrase-boost", type=float, default=2.0, help="peso dos bigramas como frase no modo combined")
+parser.add_argument("--threads", type=int, default=4, help="buscas simultâneas no modo rrf")
+parser.add_argument("--rrf-depth", type=int, default=50, help="resultados de cada busca considerados na fusão do modo rrf")
+parser.add_argument("--cache-file", default=query_cache_file, help="arquivo sqlite com os resultados de buscas anteriores, reaproveitados enquanto o índice não mudar (modos combined e rrf)")
+args = parser.parse_args()
+
+if not os.path.exists(whoosh_index_address) or not os.path.exists(document_store_address):
     print("Índice não encontrado, execute o indexador.py primeiro")
     exit(1)
-    
-stop_words = set(stopwords.words("english"))
 
 print("Abrindo índice...")
 
 ix = open_dir(whoosh_index_address)
+document_store = get_block_store()
 
 # get oq deve ser buscado do input
 
@@ -30,8 +43,7 @@ if (search == ""):
     print("Digite um termo para buscar")
     exit(1)
 
-tokens = word_tokenize(search.lower())
-tokens = [token for token in tokens if token.isalpha() and token not in stop_words]
+tokens = tokenize(search)
 bigrams = list(bigrams(tokens))
 
 
@@ -41,28 +53,101 @@ results_by_doc = {}
 
 k = [2,4,6,8,10]
 
+search_fields = ["title", "content"]
+multifield_parser = MultifieldParser(search_fields, ix.schema, group=OrGroup)
+
+def bigram_query(bigram):
+    query = multifield_parser.parse(f"{bigram[0]} {bigram[1]}")
+
+    if synonym_mode == "query":
+        query = query | whoosh_synonym_query(search_fields, list(bigram), synonym_boost)
+
+    return query
+
+def print_hit(doc_id, score):
+    # só os blocos do document store em volta dos termos da consulta são descomprimidos
+    print("ID: ", doc_id)
+    print("Título: ", document_store.title(doc_id))
+    print("Trecho: ", document_store.snippet(doc_id, tokens))
+    print("Revelância: ", score)
+    print()
+
+result_cache = QueryResultCache(path=args.cache_file) if args.cache_file else None
+
+def cached_ranking(compute):
+    """
+    (id, score) pairs of the search, from the result cache when the same
+    tokens were searched the same way in the current index generation.
+    """
+    if result_cache is None:
+        return compute()
+
+    key = cache_key("whoosh", whoosh_index_address, args.mode, tokens, search_fields, "BM25F", synonym_mode, args.limit, args.phrase_boost, args.rrf_depth)
+    ranking, cached = result_cache.get_or_compute(key, whoosh_index_version(ix), compute)
+
+    if cached:
+        print("Resultados reaproveitados do cache")
+
+    return ranking
+
+# searchers não são compartilhados entre threads; o pool empresta um a cada busca e os fecha no fim
+searcher_pool = SearcherPool(ix, weighting=BM25F)
+
+def search_bigram(bigram):
+    start_time_search = time.perf_counter()
+
+    with searcher_pool.searcher() as bigram_searcher:
+        results = bigram_searcher.search(bigram_query(bigram), limit=max(args.rrf_depth, args.limit))
+        ranking = [hit["id"] for hit in results]
+
+    return ranking, time.perf_counter() - start_time_search
+
+def combined_ranking():
+    query = whoosh_bigram_query(multifield_parser, search_fields, tokens, args.phrase_boost)
+
+    if synonym_mode == "query":
+        query = query | whoosh_synonym_query(search_fields, tokens, synonym_boost)
+
+    return [[hit["id"], hit.score] for hit in searcher.search(query, limit=args.limit)]
+
+def rrf_ranking():
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        rankings = list(executor.map(search_bigram, dict.fromkeys(bigrams)))
+
+    return reciprocal_rank_fusion([ranking for ranking, _ in rankings], limit=args.limit)
+
 with ix.searcher(weighting=BM25F) as searcher:
     start_time = time.perf_counter()
-    multifield_parser = MultifieldParser(["title", "content"], ix.schema, group=OrGroup)
-    
-    times = []
-    
-    for bigram in bigrams:
-        start_time_search = time.perf_counter()
-        query = multifield_parser.parse(f"{bigram[0]} {bigram[1]}")
-        
-        results = searcher.search(query)
-        
-        print(f"Foram encontrados {len(results)} resultados para sua consulta, tempo de busca {time.perf_counter() - start_time_search:.4f} segundos")
-        times.append(time.perf_counter() - start_time_search)
-        
-        for hit in results:
-            print("ID: ", hit["id"])
-            print("Título: ", hit["title"])
-            print("Conteúdo: ", hit["content"])
-            print("Revelância: ", hit.score)
-            print()
-        
-        print("--------------------------------------------------")
-    
-    print(f"Tempo total de busca: {time.time() - start_time:.4f} segundos")
\ No newline at end of file
+
+    if args.mode == "combined":
+        ranking = cached_ranking(combined_ranking)
+
+        print(f"Foram encontrados {len(ranking)} resultados para sua consulta ({len(bigrams)} bigramas em uma consulta), tempo de busca {time.perf_counter() - start_time:.4f} segundos")
+
+        for doc_id, score in ranking:
+            print_hit(doc_id, score)
+    elif args.mode == "rrf":
+        fused = cached_ranking(rrf_ranking)
+
+        print(f"Foram encontrados {len(fused)} resultados para sua consulta ({len(set(bigrams))} buscas fundidas), tempo de busca {time.perf_counter() - start_time:.4f} segundos")
+
+        for doc_id, score in fused:
+            print_hit(doc_id, score)
+    else:
+        times = []
+
+        for bigram in bigrams:
+            start_time_search = time.perf_counter()
+            results = searcher.search(bigram_query(bigram), limit=args.limit)
+
+            print(f"Foram encontrados {len(results)} resultados para sua consulta, tempo de busca {time.perf_counter() - start_time_search:.4f} segundos")
+            times.append(time.perf_counter() - start_time_search)
+
+            for hit in results:
+                print_hit(hit["id"], hit.score)
+
+            print("--------------------------------------------------")
+
+    print(f"Tempo total de busca: {time.perf_counter() - start_time:.4f} segundos")
+
+searcher_pool.close()
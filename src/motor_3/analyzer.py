@@ -0,0 +1,16 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from file_helper import get_source_documents
+from synonym_helper import NLTKSynonymFilter, synonym_mode, synonym_boost, base_analyzer, synonym_analyzer, analyzer, cached_analyzer
+
+# mesmos pesos de campo do whoosh_schema do motor_1
+field_boosts = {"title": 1.1, "content": 1.0}
+
+native_index_address = "native-index" if synonym_mode == "index" else "native-index-query-synonyms"
+
+def iter_documents_to_index():
+    for doc in get_source_documents():
+        yield {"id": doc['id'], "title": doc['title'], "content": doc['content'], "path": doc['path']}
@@ -0,0 +1,72 @@
+from functools import partial
+
+from analyzer import base_analyzer, native_index_address, synonym_mode
+from buscador import get_index, query_weights
+from evaluation_helper import query_terms, evaluate_rankings, latency_summary, write_report
+from file_helper import get_document_store, get_suspicious_documents, get_document_by_id
+from pool_helper import map_ordered
+
+import argparse
+import os
+import sys
+import time
+
+k = [2,4,6,8,10]
+
+def native_search(doc, max_terms=30, limit=10):
+    terms = query_terms([token.text for token in base_analyzer(doc['content'])], max_terms)
+    ix = get_index()
+
+    start_time = time.perf_counter()
+    ids = [ix.document(docnum)["id"] for docnum, _ in ix.search_weights(query_weights(" ".join(terms)), limit)]
+
+    return ids, time.perf_counter() - start_time
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Avalia a recuperação das fontes de todos os documentos suspeitos no índice nativo")
+    parser.add_argument("--procs", type=int, default=1, help="processos que consultam o índice, que é compartilhado por memory map")
+    parser.add_argument("--max-terms", type=int, default=30, help="termos mais frequentes do documento suspeito usados na consulta")
+    parser.add_argument("--limit", type=int, default=max(k), help="resultados por consulta, também a profundidade do MAP")
+    parser.add_argument("--max-queries", type=int, help="avalia só os primeiros documentos suspeitos")
+    parser.add_argument("--validate-corpus", action="store_true", help="confere o tamanho e a data de cada arquivo do corpus com o manifesto antes de começar")
+    parser.add_argument("--output", default="avaliacao-native.json", help="arquivo do relatório JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(native_index_address):
+        print("Índice não encontrado, execute o indexador.py primeiro")
+        sys.exit(1)
+
+    # só leitura: o manifesto do corpus é carregado sem conferir cada arquivo, a não ser com --validate-corpus
+    get_document_store(validate=args.validate_corpus)
+
+    suspicious_documents = list(get_suspicious_documents())[:args.max_queries]
+    limit = max(args.limit, max(k))
+
+    print(f"Consultando {len(suspicious_documents)} documentos suspeitos no índice nativo, aguarde...")
+
+    start_time = time.perf_counter()
+    results = list(map_ordered(partial(native_search, max_terms=args.max_terms, limit=limit), suspicious_documents, args.procs))
+    elapsed = time.perf_counter() - start_time
+
+    # os resultados vêm com o id do índice; o gabarito usa o nome do arquivo fonte
+    retrieved = [[document['filename'] for document in map(get_document_by_id, ids) if document is not None] for ids, _ in results]
+    relevant = [doc.get('src_file', []) for doc in suspicious_documents]
+
+    report = {
+        "engine": "native",
+        "index": native_index_address,
+        "synonym_mode": synonym_mode,
+        "max_terms": args.max_terms,
+        **latency_summary([latency for _, latency in results], elapsed),
+        **evaluate_rankings(retrieved, relevant, k, depth=limit)
+    }
+
+    write_report(args.output, report)
+
+    print(f"Consultas por segundo: {report.get('queries_per_second') or 0:.2f}")
+
+    for key in k:
+        print(f"P@{key}: {report.get('precision_at_k', {}).get(str(key), 0):.4f}  R@{key}: {report.get('recall_at_k', {}).get(str(key), 0):.4f}")
+
+    print(f"MAP@{limit}: {report.get('map', 0):.4f}")
+    print(f"Relatório salvo em {args.output}")
@@ -0,0 +1,83 @@
+from analyzer import analyzer, base_analyzer, native_index_address, synonym_mode, synonym_boost
+from docstore_helper import document_store_address, get_block_store
+from inverted_index_helper import InvertedIndex
+from query_helper import expand_synonyms
+
+import argparse
+import os
+import sys
+import time
+
+index = None
+
+def get_index():
+    global index
+
+    if index is None:
+        index = InvertedIndex(native_index_address)
+
+    return index
+
+def query_weights(query):
+    """
+    Weight of each analyzed query term, as the Whoosh query parsed from the
+    same text would score it: every distinct term once, plus the synonyms
+    with synonym_boost when they were not expanded at indexing time.
+    """
+    weights = dict.fromkeys((token.text for token in analyzer(query, mode="query")), 1.0)
+
+    if synonym_mode == "query":
+        synonyms = {synonym for _, token_synonyms in expand_synonyms(list(weights)) for synonym in token_synonyms}
+
+        for synonym in synonyms:
+            weights[synonym] = weights.get(synonym, 0.0) + synonym_boost
+
+    return weights
+
+def search(query, k=10):
+    """
+    The k best documents for query as dicts with id, title, snippet and score,
+    like the hits printed by whoosh_buscador.py.
+    """
+    ix = get_index()
+    document_store = get_block_store()
+    terms = [token.text for token in base_analyzer(query, mode="query")]
+    hits = []
+
+    for docnum, score in ix.search_weights(query_weights(query), k):
+        document = ix.document(docnum)
+        # só os blocos em volta dos termos são lidos, não o arquivo inteiro
+        hits.append({"id": document["id"], "title": document["title"], "snippet": document_store.snippet(document["id"], terms), "score": score})
+
+    return hits
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Busca no índice invertido nativo")
+    parser.add_argument("--limit", type=int, default=10, help="resultados retornados")
+    args = parser.parse_args()
+
+    if not os.path.exists(native_index_address) or not os.path.exists(document_store_address):
+        print("Índice não encontrado, execute o indexador.py primeiro")
+        sys.exit(1)
+
+    print("Abrindo índice...")
+
+    get_index()
+
+    search_term = input("Digite o termo que deseja buscar: ")
+
+    if search_term == "":
+        print("Digite um termo para buscar")
+        sys.exit(1)
+
+    start_time = time.perf_counter()
+    results = search(search_term, args.limit)
+
+    print(f"Foram encontrados {len(results)} resultados para sua consulta, tempo de busca {time.perf_counter() - start_time:.4f} segundos")
+
+    for hit in results:
+        print("ID: ", hit["id"])
+        print("Título: ", hit["title"])
+        print("Trecho: ", hit["snippet"])
+        print("Revelância: ", hit["score"])
+        print()
@@ -0,0 +1,45 @@
+from analyzer import cached_analyzer, field_boosts, native_index_address, iter_documents_to_index, synonym_mode
+from inverted_index_helper import InvertedIndexWriter
+from docstore_helper import update_document_store
+from file_helper import get_source_documents
+from pool_helper import map_ordered
+
+import argparse
+import time
+
+def analyze_document(doc):
+    return (
+        {"id": doc["id"], "title": doc["title"], "path": doc["path"]},
+        {field: cached_analyzer.terms(doc[field] or "") for field in field_boosts}
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Indexa os documentos fonte no índice invertido nativo")
+    parser.add_argument("--procs", type=int, default=1, help="processos que rodam o analisador")
+    args = parser.parse_args()
+
+    documents_count = sum(1 for _ in get_source_documents())
+
+    total_start_time = time.time()
+    print(f"Indexando {documents_count} documentos com {args.procs} processo(s), aguarde...")
+
+    writer = InvertedIndexWriter(native_index_address, field_boosts)
+
+    for idx, (stored, fields) in enumerate(map_ordered(analyze_document, iter_documents_to_index(), args.procs)):
+        writer.add_document(stored, fields)
+
+        if (idx + 1) % 100 == 0 or idx + 1 == documents_count:
+            print(f"Analisados {idx + 1} documentos ({(idx + 1) / documents_count * 100:.2f}%)")
+
+    print("Gravando o índice...")
+
+    writer.commit(analyzer=cached_analyzer.fingerprint, synonym_mode=synonym_mode)
+
+    # os trechos dos resultados vêm do document store, compartilhado com os outros motores
+    print("Atualizando o document store...")
+
+    if not update_document_store(procs=args.procs):
+        print("Document store sem alterações")
+
+    print(f"Documentos indexados com sucesso!")
+    print(f"Tempo total de indexação: {time.time() - total_start_time:.4f} segundos")
@@ -0,0 +1,28 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+def map_ordered(function, items, procs=1, max_pending=None):
+    """
+    Lazily yield function(item) for each item, in order.
+
+    With procs > 1 the calls run in a process pool, but at most max_pending
+    items are in flight at once, so a long input (e.g. the whole corpus) is
+    never materialized in memory the way Pool.imap would queue it.
+    """
+    if procs <= 1:
+        yield from map(function, items)
+        return
+
+    max_pending = max_pending or procs * 4
+
+    with ProcessPoolExecutor(max_workers=procs) as executor:
+        pending = deque()
+
+        for item in items:
+            pending.append(executor.submit(function, item))
+
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
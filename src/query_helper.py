@@ -0,0 +1,70 @@
+from collections import defaultdict
+from whoosh.query import Or, Phrase, Term
+
+from word_helper import get_synonyms
+
+def expand_synonyms(tokens):
+    """
+    Pair each query token with its WordNet synonyms, keeping the query order.
+    """
+    return [(token, sorted(get_synonyms(token))) for token in tokens]
+
+def whoosh_synonym_query(fields, tokens, synonym_boost=0.5):
+    """
+    Synonym clauses to OR into a query on an index analyzed without
+    NLTKSynonymFilter, down-weighted by synonym_boost. The synonyms are used
+    verbatim, as the index-time filter would have emitted them.
+    """
+    clauses = []
+
+    for token, synonyms in expand_synonyms(tokens):
+        for field in fields:
+            clauses.extend(Term(field, synonym, boost=synonym_boost) for synonym in synonyms)
+
+    return Or(clauses)
+
+def es_synonym_clauses(fields, tokens, synonym_boost=0.5):
+    """
+    Extra bool "should" clauses matching the synonyms of tokens on fields,
+    down-weighted by synonym_boost.
+    """
+    synonyms = sorted({synonym for _, token_synonyms in expand_synonyms(tokens) for synonym in token_synonyms})
+
+    if not synonyms:
+        return []
+
+    return [
+        {"match": {field: {"query": " ".join(synonyms), "boost": synonym_boost}}}
+        for field in fields
+    ]
+
+def unique_bigrams(tokens):
+    """
+    Pairs of consecutive query tokens, in order and without repeats.
+    """
+    return list(dict.fromkeys(zip(tokens, tokens[1:])))
+
+def whoosh_bigram_query(parser, fields, tokens, phrase_boost=2.0):
+    """
+    A single query covering every bigram of tokens: each term once, ORed, plus
+    each bigram as a phrase on every field boosted by phrase_boost, so the
+    documents holding the bigrams contiguously rank first.
+    """
+    phrases = [Phrase(field, list(bigram), boost=phrase_boost) for bigram in unique_bigrams(tokens) for field in fields]
+
+    return Or([parser.parse(" ".join(tokens)), *phrases])
+
+def reciprocal_rank_fusion(rankings, k=60, limit=None):
+    """
+    Fuse several ranked lists of document ids into one list of (id, score),
+    scoring each document with the sum of 1 / (k + rank) over the lists.
+    """
+    scores = defaultdict(float)
+
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1 / (k + rank)
+
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    return fused[:limit] if limit else fused
@@ -0,0 +1,108 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import json
+import time
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the search service.
+
+    GET /search?q=...&engine=whoosh&limit=10 (or POST /search with the same
+    keys in a JSON body) answers with the hits as id, title, score and
+    snippet; GET /health reports the engines and their state.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if url.path == "/health":
+            self.send_json(200, self.server.health())
+        elif url.path == "/search":
+            self.search({key: values[-1] for key, values in parse_qs(url.query).items()})
+        else:
+            self.send_json(404, {"error": f"caminho desconhecido: {url.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/search":
+            self.send_json(404, {"error": f"caminho desconhecido: {self.path}"})
+            return
+
+        try:
+            params = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except json.JSONDecodeError as e:
+            self.send_json(400, {"error": f"JSON inválido: {e}"})
+            return
+
+        self.search(params)
+
+    def search(self, params):
+        query = str(params.get("q", "")).strip()
+        engine = params.get("engine", self.server.default_engine)
+
+        if not query:
+            self.send_json(400, {"error": "parâmetro q vazio"})
+            return
+
+        if engine not in self.server.engines:
+            self.send_json(400, {"error": f"engine desconhecida: {engine}, use uma de {sorted(self.server.engines)}"})
+            return
+
+        try:
+            limit = int(params.get("limit", 10))
+        except (TypeError, ValueError):
+            self.send_json(400, {"error": "limit precisa ser um número inteiro"})
+            return
+
+        # cada resultado tem título e trecho lidos do document store, então o tamanho da página é limitado
+        if not 1 <= limit <= self.server.max_limit:
+            self.send_json(400, {"error": f"limit precisa estar entre 1 e {self.server.max_limit}"})
+            return
+
+        start_time = time.perf_counter()
+
+        try:
+            hits = self.server.engines[engine](query, limit)
+        except Exception as e:
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        self.send_json(200, {
+            "query": query,
+            "engine": engine,
+            "took_ms": (time.perf_counter() - start_time) * 1000,
+            "hits": hits
+        })
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class SearchServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering each request in its own thread with one of
+    the engines, callables taking (query, limit) and returning the hits.
+    Requests asking for more than max_limit hits are rejected.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, engines, default_engine=None, health=None, verbose=False, max_limit=100):
+        super().__init__(address, SearchRequestHandler)
+        self.engines = engines
+        self.default_engine = default_engine or next(iter(engines))
+        self.health_check = health
+        self.verbose = verbose
+        self.max_limit = max_limit
+
+    def health(self):
+        return {"status": "ok", "engines": sorted(self.engines), **(self.health_check() if self.health_check else {})}
@@ -0,0 +1,34 @@
+from whoosh.analysis import Filter
+
+import os
+
+from analysis_helper import CachedAnalyzer
+from tokenizer_helper import base_analyzer as tokenizer_base_analyzer
+from word_helper import get_synonyms, synonym_source_version
+
+# cadeia de análise dos índices de texto, compartilhada pelo motor_1, motor-2 e motor_3:
+# uma cópia só, para que os fingerprints do cache de análise não se separem
+
+class NLTKSynonymFilter(Filter):
+    def __call__(self, tokens):
+        for token in tokens:
+            yield token  # Retorna o token original
+            synonyms = get_synonyms(token.text)
+            for synonym in synonyms:  # Obtém os sinônimos
+                new_token = token.copy()
+                new_token.text = synonym
+                yield new_token  # Retorna cada sinônimo como novo token
+
+# "index" expande os sinônimos na indexação; "query" indexa só os termos originais
+# e adiciona os sinônimos na consulta, com peso synonym_boost
+synonym_mode = os.environ.get("SYNONYM_MODE", "index")
+synonym_boost = float(os.environ.get("SYNONYM_BOOST", "0.5"))
+
+base_analyzer = tokenizer_base_analyzer()
+
+synonym_analyzer = base_analyzer | NLTKSynonymFilter()
+
+analyzer = synonym_analyzer if synonym_mode == "index" else base_analyzer
+
+# cache persistente da análise, compartilhado pelos indexadores dos três motores
+cached_analyzer = CachedAnalyzer(analyzer, salt=synonym_source_version() if synonym_mode == "index" else "")
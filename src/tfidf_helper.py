@@ -0,0 +1,138 @@
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from file_helper import publish_directory
+
+index_format_version = 1
+
+def analyzed_terms(terms):
+    # os textos chegam já analisados; o TfidfVectorizer só conta os termos
+    return terms
+
+def create_vectorizer(vocabulary=None, sublinear_tf=True, min_df=1, max_df=1.0):
+    return TfidfVectorizer(
+        analyzer=analyzed_terms,
+        vocabulary=vocabulary,
+        sublinear_tf=sublinear_tf,
+        min_df=min_df,
+        max_df=max_df,
+        dtype=np.float32
+    )
+
+def build_tfidf_index(address, term_lists, documents, sublinear_tf=True, min_df=1, max_df=1.0, **meta):
+    """
+    Fit the TF-IDF weights on the analyzed terms of the source documents and
+    save the L2-normalized (documents x vocabulary) matrix as a compressed
+    .npz, with the vocabulary and idf needed to vectorize queries the same
+    way. term_lists may be a generator; documents receives the stored values
+    of each document as they are consumed. The index at address is only
+    replaced once the new one is complete.
+    """
+    vectorizer = create_vectorizer(sublinear_tf=sublinear_tf, min_df=min_df, max_df=max_df)
+    matrix = vectorizer.fit_transform(term_lists).tocsr()
+
+    temporary_address = address + ".tmp"
+    shutil.rmtree(temporary_address, ignore_errors=True)
+    os.makedirs(temporary_address)
+
+    sparse.save_npz(os.path.join(temporary_address, "sources.npz"), matrix, compressed=True)
+    np.save(os.path.join(temporary_address, "idf.npy"), vectorizer.idf_.astype(np.float32))
+
+    with open(os.path.join(temporary_address, "terms.txt"), "w", encoding="utf-8") as f:
+        f.writelines(term + "\n" for term in vectorizer.get_feature_names_out())
+
+    with open(os.path.join(temporary_address, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump(documents, f, ensure_ascii=False)
+
+    with open(os.path.join(temporary_address, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": index_format_version,
+            "doc_count": matrix.shape[0],
+            "terms": matrix.shape[1],
+            "nonzeros": int(matrix.nnz),
+            "sublinear_tf": sublinear_tf,
+            "min_df": min_df,
+            "max_df": max_df,
+            **meta
+        }, f, ensure_ascii=False, indent=2)
+
+    publish_directory(temporary_address, address)
+
+    return matrix.shape
+
+def top_k_rows(scores, k):
+    """
+    (document numbers, scores) of the k largest positive scores of each row of
+    a dense matrix, best first and ties in document order.
+    """
+    k = min(k, scores.shape[1])
+
+    if not k:
+        return [([], []) for _ in range(len(scores))]
+
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k] if scores.shape[1] > k else np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.lexsort((best, -best_scores), axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+    return [(row[row_scores > 0].tolist(), row_scores[row_scores > 0].tolist()) for row, row_scores in zip(best, best_scores)]
+
+class TfidfIndex:
+    """
+    Read side of build_tfidf_index, ranking many queries at once: they are
+    vectorized into one sparse matrix and multiplied by the source matrix in
+    chunks of rows, so the dense score block of a chunk stays under
+    max_block_bytes whatever the number of queries.
+    """
+
+    def __init__(self, address):
+        # o link é resolvido uma vez, para que todos os arquivos venham da mesma versão
+        address = os.path.realpath(address)
+        self.address = address
+
+        with open(os.path.join(address, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        if self.meta.get("version") != index_format_version:
+            raise ValueError(f"índice {address} com formato {self.meta.get('version')}, esperado {index_format_version}")
+
+        with open(os.path.join(address, "terms.txt"), encoding="utf-8") as f:
+            vocabulary = {line.rstrip("\n"): idx for idx, line in enumerate(f)}
+
+        with open(os.path.join(address, "documents.json"), encoding="utf-8") as f:
+            self.documents = json.load(f)
+
+        self.vectorizer = create_vectorizer(vocabulary, self.meta["sublinear_tf"])
+        self.vectorizer.idf_ = np.load(os.path.join(address, "idf.npy"))
+        # transposta uma vez: cada bloco de consultas é um único produto CSR x CSR
+        self.sources = sparse.load_npz(os.path.join(address, "sources.npz")).T.tocsr()
+
+    def transform(self, term_lists):
+        return self.vectorizer.transform(term_lists)
+
+    def rank_many(self, term_lists, k=10, max_block_bytes=1 << 28):
+        """
+        The k best (document number, cosine similarity) pairs of every query,
+        given as lists of analyzed terms.
+        """
+        queries = self.transform(term_lists).tocsr()
+        chunk_size = max(1, max_block_bytes // (4 * max(self.sources.shape[1], 1)))
+        results = []
+
+        for start in range(0, queries.shape[0], chunk_size):
+            scores = (queries[start:start + chunk_size] @ self.sources).toarray()
+
+            for docnums, doc_scores in top_k_rows(scores, k):
+                results.append(list(zip(docnums, doc_scores)))
+
+        return results
+
+    def document(self, docnum):
+        return self.documents[docnum]
@@ -0,0 +1,98 @@
+from functools import partial
+from itertools import islice
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+from whoosh.analysis import RegexTokenizer, LowercaseFilter, StopFilter
+
+import os
+import re
+
+from pool_helper import map_ordered
+
+stop_words = frozenset(stopwords.words("english"))
+
+# "fast" separa as sequências de letras com uma regex; "compat" usa o word_tokenize
+# do nltk e dá exatamente os mesmos tokens que ele
+tokenizer_mode = os.environ.get("TOKENIZER_MODE", "fast")
+tokenizer_modes = ("fast", "compat")
+
+# letras unicode: \w sem dígitos e sem _
+word_pattern = re.compile(r"[^\W\d_]+")
+
+def words(text, mode=None):
+    """
+    Lowercase alphabetic tokens of text, stopwords included.
+
+    The fast mode takes the runs of letters of the text, so contractions,
+    hyphenated and dotted words are split ("don't" gives "don" and "t")
+    where word_tokenize keeps them as one non-alphabetic token that the
+    isalpha filter drops. The compat mode is word_tokenize followed by that
+    filter.
+    """
+    mode = mode or tokenizer_mode
+
+    if mode == "compat":
+        return [token for token in word_tokenize(text.lower()) if token.isalpha()]
+
+    if mode != "fast":
+        raise ValueError(f"modo de tokenização desconhecido: {mode}")
+
+    # a regex aceita caracteres numéricos que não são dígitos (como ½), que isalpha recusa
+    return [token for token in word_pattern.findall(text.lower()) if token.isalpha()]
+
+def preprocess_text(text, mode=None):
+    """
+    Preprocess text by:
+    1. Converting to lowercase
+    2. Tokenizing
+    3. Removing stopwords and non-alphabetic tokens
+
+    Returns:
+        tuple: (tokens, removed_stop_words)
+    """
+    tokens = []
+    removed_stop_words = []
+
+    for token in words(text, mode):
+        if token in stop_words:
+            removed_stop_words.append(token)
+        else:
+            tokens.append(token)
+
+    return tokens, removed_stop_words
+
+def tokenize(text, mode=None):
+    """
+    Lowercase alphabetic tokens of text without the stopwords.
+    """
+    return [token for token in words(text, mode) if token not in stop_words]
+
+def preprocess_batch(texts, mode=None):
+    return [preprocess_text(text, mode) for text in texts]
+
+def preprocess_many(texts, procs=1, mode=None, batch_size=64):
+    """
+    Lazily yield preprocess_text(text) for each text, in order, with batches
+    of batch_size texts sent to a pool of procs processes.
+    """
+    texts = iter(texts)
+    batches = iter(lambda: list(islice(texts, batch_size)), [])
+
+    for batch in map_ordered(partial(preprocess_batch, mode=mode), batches, procs):
+        yield from batch
+
+def tokenize_many(texts, procs=1, mode=None, batch_size=64):
+    """
+    Lazily yield tokenize(text) for each text, in order, tokenizing batches
+    of texts on a pool of procs processes.
+    """
+    for tokens, _ in preprocess_many(texts, procs, mode, batch_size):
+        yield tokens
+
+def base_analyzer():
+    """
+    The Whoosh analysis chain the indexes share: Whoosh's word regex,
+    lowercase and the same stopword list, so indexes and the analysis cache
+    built before this module existed keep their fingerprint.
+    """
+    return RegexTokenizer() | LowercaseFilter() | StopFilter(stoplist=stop_words)
@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+
+import threading
+import time
+
+def analyzer_fingerprints(schema):
+    """
+    Map each field of the schema to the fingerprint of its CachedAnalyzer
+    (None for fields without one). An index keeps the schema it was created
+    with, analyzers included, so a different map means the index would keep
+    analyzing with the old chain.
+    """
+    return {name: getattr(getattr(schema[name], 'analyzer', None), 'fingerprint', None) for name in schema.names()}
+
+def indexed_field_values(reader, fieldname):
+    """
+    Map each live document number to its term in an ID field, read from the
+    postings so the stored title and content are never loaded.
+    """
+    values = {}
+
+    for term in reader.lexicon(fieldname):
+        value = term.decode('utf-8')
+
+        for docnum in reader.postings(fieldname, term).all_ids():
+            values[docnum] = value
+
+    return values
+
+def indexed_content_hashes(reader):
+    """
+    Map the id of every document in the index to its stored content_hash.
+    """
+    ids = indexed_field_values(reader, 'id')
+    content_hashes = indexed_field_values(reader, 'content_hash')
+
+    return {doc_id: content_hashes.get(docnum) for docnum, doc_id in ids.items()}
+
+class SearcherPool:
+    """
+    Warm searchers over one index, shared by the threads of a long-lived
+    service.
+
+    A searcher is lent to one thread at a time and returned afterwards, so
+    each one keeps its open readers and caches between requests. When the
+    index generation changes (checked at most every check_interval seconds)
+    the idle searchers are dropped and new ones open the latest commit.
+    """
+
+    def __init__(self, ix, check_interval=1.0, **searcher_kwargs):
+        self.ix = ix
+        self.check_interval = check_interval
+        self.searcher_kwargs = searcher_kwargs
+        self.lock = threading.Lock()
+        self.idle = []
+        self.generation = ix.latest_generation()
+        self.last_check = time.monotonic()
+
+    def check_generation(self):
+        now = time.monotonic()
+
+        if now - self.last_check < self.check_interval:
+            return
+
+        with self.lock:
+            self.last_check = now
+            generation = self.ix.latest_generation()
+
+            if generation != self.generation:
+                self.generation = generation
+
+                for searcher in self.idle:
+                    searcher.close()
+
+                self.idle = []
+
+    def current_generation(self):
+        self.check_generation()
+        return self.generation
+
+    @contextmanager
+    def searcher(self):
+        self.check_generation()
+
+        with self.lock:
+            generation = self.generation
+            searcher = self.idle.pop() if self.idle else None
+
+        if searcher is None:
+            searcher = self.ix.searcher(**self.searcher_kwargs)
+
+        try:
+            yield searcher
+        finally:
+            with self.lock:
+                # searchers de uma geração antiga não voltam para o pool
+                if generation == self.generation:
+                    self.idle.append(searcher)
+                else:
+                    searcher.close()
+
+    def close(self):
+        with self.lock:
+            for searcher in self.idle:
+                searcher.close()
+
+            self.idle = []
@@ -0,0 +1,239 @@
+from minhash_helper import ngram_hashes
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+index_format_version = 1
+
+# posição de cada impressão digital no texto: n-grama e intervalo de caracteres
+fingerprint_dtype = np.dtype([("position", np.int32), ("start", np.int32), ("end", np.int32)])
+posting_dtype = np.dtype([("doc", np.int32), ("position", np.int32), ("start", np.int32), ("end", np.int32)])
+
+def winnow(hashes, window=4):
+    """
+    Positions selected by winnowing: the rightmost minimum hash of every
+    window of consecutive n-gram hashes, each position once. Any passage
+    shared by two texts with at least window + n - 1 terms shares at least one
+    selected hash.
+    """
+    if len(hashes) <= window:
+        return np.array([len(hashes) - 1 - np.argmin(hashes[::-1])], dtype=np.int64) if len(hashes) else np.empty(0, dtype=np.int64)
+
+    windows = sliding_window_view(hashes, window)
+    rightmost = window - 1 - np.argmin(windows[:, ::-1], axis=1)
+
+    return np.unique(np.arange(len(windows)) + rightmost)
+
+def fingerprint(tokens, kgram_size=5, window=4):
+    """
+    Winnowed fingerprints of an analyzed text given as (term, startchar,
+    endchar) tuples: the n-gram hashes and, for each, its n-gram number and
+    the characters it spans in the original text.
+    """
+    if not tokens:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=fingerprint_dtype)
+
+    terms, starts, ends = zip(*tokens)
+    hashes = ngram_hashes(list(terms), kgram_size)
+    positions = winnow(hashes, window)
+    size = len(terms) - len(hashes) + 1
+
+    fingerprints = np.empty(len(positions), dtype=fingerprint_dtype)
+    fingerprints["position"] = positions
+    fingerprints["start"] = np.asarray(starts, dtype=np.int32)[positions]
+    fingerprints["end"] = np.asarray(ends, dtype=np.int32)[positions + size - 1]
+
+    return hashes[positions], fingerprints
+
+class FingerprintIndexWriter:
+    """
+    Builds a winnowing fingerprint index in shards: the fingerprints of the
+    documents are buffered until shard_size of them, then sorted by hash and
+    saved as a contiguous hash array plus the matching postings (document,
+    n-gram number, character range). Memory never holds more than one shard,
+    whatever the size of the corpus.
+    """
+
+    def __init__(self, address, shard_size=1 << 22):
+        self.address = address
+        self.temporary_address = address + ".tmp"
+        self.shard_size = shard_size
+        self.documents = []
+        self.shards = 0
+        self.fingerprint_count = 0
+        self.buffer = []
+        self.buffered = 0
+
+        shutil.rmtree(self.temporary_address, ignore_errors=True)
+        os.makedirs(self.temporary_address)
+
+    def add_document(self, stored, hashes, fingerprints):
+        docnum = len(self.documents)
+        self.documents.append(stored)
+
+        postings = np.empty(len(fingerprints), dtype=posting_dtype)
+        postings["doc"] = docnum
+
+        for field in fingerprint_dtype.names:
+            postings[field] = fingerprints[field]
+
+        self.buffer.append((hashes, postings))
+        self.buffered += len(hashes)
+
+        if self.buffered >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+
+        hashes = np.concatenate([hashes for hashes, _ in self.buffer])
+        postings = np.concatenate([postings for _, postings in self.buffer])
+        # a ordenação estável mantém as postings de cada hash na ordem dos documentos
+        order = np.argsort(hashes, kind="stable")
+
+        np.save(os.path.join(self.temporary_address, f"shard-{self.shards:05d}.hashes.npy"), hashes[order])
+        np.save(os.path.join(self.temporary_address, f"shard-{self.shards:05d}.postings.npy"), postings[order])
+
+        self.shards += 1
+        self.fingerprint_count += len(hashes)
+        self.buffer = []
+        self.buffered = 0
+
+    def commit(self, **meta):
+        """
+        Write the last shard and the metadata, replacing any index already at
+        the address only once the new one is complete.
+        """
+        self.flush()
+
+        with open(os.path.join(self.temporary_address, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+
+        with open(os.path.join(self.temporary_address, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": index_format_version,
+                "doc_count": len(self.documents),
+                "shards": self.shards,
+                "fingerprints": self.fingerprint_count,
+                **meta
+            }, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(self.address, ignore_errors=True)
+        os.replace(self.temporary_address, self.address)
+
+class FingerprintIndex:
+    """
+    Read side of FingerprintIndexWriter, with every shard memory-mapped, so
+    any number of processes can join against it sharing the page cache.
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+        with open(os.path.join(address, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        if self.meta.get("version") != index_format_version:
+            raise ValueError(f"índice {address} com formato {self.meta.get('version')}, esperado {index_format_version}")
+
+        with open(os.path.join(address, "documents.json"), encoding="utf-8") as f:
+            self.documents = json.load(f)
+
+        self.shards = [
+            (
+                np.load(os.path.join(address, f"shard-{shard:05d}.hashes.npy"), mmap_mode="r"),
+                np.load(os.path.join(address, f"shard-{shard:05d}.postings.npy"), mmap_mode="r")
+            )
+            for shard in range(self.meta["shards"])
+        ]
+
+    def join(self, hashes, fingerprints, documents=None, max_postings=64):
+        """
+        Seeds shared by the query fingerprints and the index: one
+        (query fingerprint, source posting) pair per hash match, found with a
+        binary search of every query hash in every shard. Hashes with more
+        than max_postings occurrences in a shard (boilerplate) are skipped,
+        and documents, when given, restricts the seeds to those document
+        numbers (e.g. candidates from the MinHash index).
+        """
+        queries = []
+        postings = []
+
+        for shard_hashes, shard_postings in self.shards:
+            starts = np.searchsorted(shard_hashes, hashes, side="left")
+            ends = np.searchsorted(shard_hashes, hashes, side="right")
+            counts = ends - starts
+            counts[counts > max_postings] = 0
+
+            if not counts.sum():
+                continue
+
+            # posições de todos os intervalos encontrados, concatenadas
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            queries.append(np.repeat(np.arange(len(hashes)), counts))
+            postings.append(shard_postings[positions])
+
+        if not queries:
+            return np.empty(0, dtype=fingerprint_dtype), np.empty(0, dtype=posting_dtype)
+
+        queries = np.concatenate(queries)
+        postings = np.concatenate(postings)
+
+        if documents is not None:
+            selected = np.isin(postings["doc"], np.asarray(list(documents), dtype=np.int32))
+            queries, postings = queries[selected], postings[selected]
+
+        return fingerprints[queries], postings
+
+    def document(self, docnum):
+        return self.documents[docnum]
+
+def extend_seeds(seeds, postings, max_gap=8, min_seeds=2):
+    """
+    Seed-and-extend alignment: seeds of the same source document are chained,
+    in query order, while both the query and the source advance by at most
+    max_gap n-grams from the last seed of the chain; chains with at least
+    min_seeds seeds become passages. Returns (document number, query start,
+    query end, source start, source end, seeds) tuples with character
+    offsets.
+    """
+    passages = []
+    order = np.lexsort((postings["position"], seeds["position"], postings["doc"]))
+    documents, firsts = np.unique(postings["doc"][order], return_index=True)
+
+    for docnum, first, last in zip(documents, firsts, np.r_[firsts[1:], len(order)]):
+        chains = []
+
+        for idx in order[first:last]:
+            seed = seeds[idx]
+            posting = postings[idx]
+
+            for chain in chains:
+                last_seed, last_posting = chain[-1]
+
+                if 0 <= seed["position"] - last_seed["position"] <= max_gap and abs(int(posting["position"]) - int(last_posting["position"])) <= max_gap:
+                    chain.append((seed, posting))
+                    break
+            else:
+                chains.append([(seed, posting)])
+
+        for chain in chains:
+            if len(chain) < min_seeds:
+                continue
+
+            passages.append((
+                int(docnum),
+                int(min(seed["start"] for seed, _ in chain)),
+                int(max(seed["end"] for seed, _ in chain)),
+                int(min(posting["start"] for _, posting in chain)),
+                int(max(posting["end"] for _, posting in chain)),
+                len(chain)
+            ))
+
+    return passages
@@ -1,26 +1,287 @@
-from nltk.corpus import wordnet, stopwords
+from array import array
+from functools import lru_cache
 import nltk
 
+import json
+import mmap
 import os
 import sys
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-nltk.download("wordnet")
-nltk.download("omw-1.4")
+from tokenizer_helper import stop_words
 
-stop_words = set(stopwords.words("english"))
+synonym_table_file = os.path.join(os.path.dirname(__file__), '..', 'resources', 'wordnet-synonyms.bin')
+synonym_table_magic = b'WNSYN001'
 
-synonyms_cache = {}
+# mesma ordem de POS_LIST do nltk, que define a ordem em que synsets() percorre as classes
+synonym_table_pos = 'nvar'
+
+class SynonymTable:
+    """
+    Read-only, memory-mapped WordNet lemma -> synonyms table.
+
+    The file holds every term (lemmas, exception forms and synonym names)
+    interned to an id in byte order, plus offset arrays pointing into flat
+    id arrays, one slot per (term, part of speech). Lookups replicate
+    wordnet.synsets(word) including its morphy step, so get_synonyms returns
+    the same sets without loading the WordNet corpus reader.
+    """
+
+    def __init__(self, path=synonym_table_file):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[:8] != synonym_table_magic:
+            raise ValueError(f'Arquivo de sinônimos inválido: {path}')
+
+        header_length = int.from_bytes(self.buffer[8:12], 'little')
+        self.header = json.loads(self.buffer[12:12 + header_length])
+
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f'Arquivo de sinônimos gerado com outra ordem de bytes: {path}')
+
+        view = memoryview(self.buffer)
+
+        def section(name):
+            offset, length, typecode = self.header['sections'][name]
+            return view[offset:offset + length].cast(typecode)
+
+        self.term_offsets = section('term_offsets')
+        self.terms = section('terms')
+        self.pos_mask = section('pos_mask')
+        self.synonym_offsets = section('synonym_offsets')
+        self.synonyms = section('synonyms')
+        self.exception_offsets = section('exception_offsets')
+        self.exceptions = section('exceptions')
+        self.substitutions = self.header['substitutions']
+        self.size = self.header['size']
+
+    def term(self, term_id):
+        return bytes(self.terms[self.term_offsets[term_id]:self.term_offsets[term_id + 1]]).decode('utf-8')
+
+    def term_id(self, term):
+        key = term.encode('utf-8')
+        low, high = 0, self.size
+
+        while low < high:
+            middle = (low + high) // 2
+            middle_term = bytes(self.terms[self.term_offsets[middle]:self.term_offsets[middle + 1]])
+
+            if middle_term < key:
+                low = middle + 1
+            elif middle_term > key:
+                high = middle
+            else:
+                return middle
+
+        return None
+
+    def slot(self, offsets, values, term_id, pos_idx):
+        slot = term_id * len(synonym_table_pos) + pos_idx
+        return values[offsets[slot]:offsets[slot + 1]]
+
+    def morphy(self, form, form_id, pos_idx):
+        pos = synonym_table_pos[pos_idx]
+        exceptions = self.slot(self.exception_offsets, self.exceptions, form_id, pos_idx) if form_id is not None else ()
+
+        if len(exceptions):
+            forms = [self.term(exception_id) for exception_id in exceptions]
+        else:
+            forms = [form[:-len(old)] + new for old, new in self.substitutions[pos] if form.endswith(old)]
+
+        form_ids = []
+
+        for candidate in [form] + forms:
+            candidate_id = form_id if candidate == form else self.term_id(candidate)
+
+            if candidate_id is not None and self.pos_mask[candidate_id] & (1 << pos_idx) and candidate_id not in form_ids:
+                form_ids.append(candidate_id)
+
+        return form_ids
+
+    def get_synonyms(self, word):
+        lemma = word.lower()
+        lemma_id = self.term_id(lemma)
+        synonyms = set()
+
+        for pos_idx in range(len(synonym_table_pos)):
+            for form_id in self.morphy(lemma, lemma_id, pos_idx):
+                for synonym_id in self.slot(self.synonym_offsets, self.synonyms, form_id, pos_idx):
+                    synonyms.add(self.term(synonym_id))
+
+        synonyms.discard(word)
+        return synonyms
+
+def build_synonym_table(path=synonym_table_file):
+    """
+    Dump the WordNet lemma index, synonyms, exception lists and morphy rules
+    into the binary table read by SynonymTable.
+    """
+    nltk.download("wordnet")
+    nltk.download("omw-1.4")
+
+    from nltk.corpus import wordnet
+
+    wordnet.ensure_loaded()
+
+    # os mapas internos do leitor são a única forma de obter os offsets sem aplicar o morphy
+    lemma_pos_offset_map = wordnet._lemma_pos_offset_map
+    exception_map = wordnet._exception_map
+
+    synonyms_by_slot = {}
+    exceptions_by_slot = {}
+    pos_by_lemma = {}
+
+    for lemma, offsets_by_pos in lemma_pos_offset_map.items():
+        for pos_idx, pos in enumerate(synonym_table_pos):
+            offsets = offsets_by_pos.get(pos)
+
+            if not offsets:
+                continue
+
+            pos_by_lemma[lemma] = pos_by_lemma.get(lemma, 0) | (1 << pos_idx)
+            synonyms_by_slot[(lemma, pos_idx)] = {
+                synonym.name()
+                for offset in offsets
+                for synonym in wordnet.synset_from_pos_and_offset(pos, offset).lemmas()
+            }
+
+    for pos_idx, pos in enumerate(synonym_table_pos):
+        for form, base_forms in exception_map[pos].items():
+            exceptions_by_slot[(form, pos_idx)] = base_forms
+
+    terms = set(pos_by_lemma)
+    terms.update(form for form, _ in exceptions_by_slot)
+
+    for synonyms in synonyms_by_slot.values():
+        terms.update(synonyms)
+
+    for base_forms in exceptions_by_slot.values():
+        terms.update(base_forms)
+
+    encoded_terms = sorted(term.encode('utf-8') for term in terms)
+    term_ids = {term.decode('utf-8'): term_id for term_id, term in enumerate(encoded_terms)}
+
+    term_offsets = array('I', [0])
+    for term in encoded_terms:
+        term_offsets.append(term_offsets[-1] + len(term))
+
+    pos_mask = array('B', [0] * len(encoded_terms))
+    for lemma, mask in pos_by_lemma.items():
+        pos_mask[term_ids[lemma]] = mask
+
+    def flatten(values_by_slot, sort):
+        offsets = array('I', [0])
+        values = array('I')
+
+        for term in encoded_terms:
+            term = term.decode('utf-8')
+
+            for pos_idx in range(len(synonym_table_pos)):
+                slot_values = [term_ids[value] for value in values_by_slot.get((term, pos_idx), ())]
+                values.extend(sorted(slot_values) if sort else slot_values)
+                offsets.append(len(values))
+
+        return offsets, values
+
+    synonym_offsets, synonyms = flatten(synonyms_by_slot, sort=True)
+    # a ordem das exceções importa: o morphy devolve as formas na ordem do arquivo
+    exception_offsets, exceptions = flatten(exceptions_by_slot, sort=False)
+
+    sections = [
+        ('term_offsets', term_offsets.tobytes(), 'I'),
+        ('terms', b''.join(encoded_terms), 'B'),
+        ('pos_mask', pos_mask.tobytes(), 'B'),
+        ('synonym_offsets', synonym_offsets.tobytes(), 'I'),
+        ('synonyms', synonyms.tobytes(), 'I'),
+        ('exception_offsets', exception_offsets.tobytes(), 'I'),
+        ('exceptions', exceptions.tobytes(), 'I'),
+    ]
+
+    header = {
+        'byteorder': sys.byteorder,
+        'size': len(encoded_terms),
+        'substitutions': {pos: wordnet.MORPHOLOGICAL_SUBSTITUTIONS[pos] for pos in synonym_table_pos},
+        'sections': {}
+    }
+
+    # os offsets das seções dependem do tamanho do cabeçalho, que é reservado com folga
+    header_length = len(json.dumps(header).encode('utf-8')) + 64 * len(sections)
+    offset = 12 + header_length
+
+    for name, data, typecode in sections:
+        offset = (offset + 7) & ~7
+        header['sections'][name] = [offset, len(data), typecode]
+        offset += len(data)
+
+    encoded_header = json.dumps(header).encode('utf-8').ljust(header_length)
+
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(synonym_table_magic)
+        f.write(header_length.to_bytes(4, 'little'))
+        f.write(encoded_header)
+
+        for name, data, typecode in sections:
+            f.seek(header['sections'][name][0])
+            f.write(data)
+
+    os.replace(f'{path}.tmp', path)
+
+    return len(encoded_terms)
+
+synonym_table = None
+wordnet_ready = False
+
+def get_synonym_table():
+    global synonym_table, wordnet_ready
+
+    if synonym_table is None and not wordnet_ready:
+        if os.path.exists(synonym_table_file):
+            synonym_table = SynonymTable()
+        else:
+            print("Tabela de sinônimos não encontrada, usando o WordNet do nltk (execute word_helper.py para gerá-la)")
+            nltk.download("wordnet")
+            nltk.download("omw-1.4")
+            wordnet_ready = True
+
+    return synonym_table
+
+def synonym_source_version():
+    """
+    Identify where get_synonyms answers from, so caches of expanded text can
+    tell when the synonyms change.
+    """
+    if os.path.exists(synonym_table_file):
+        table_stat = os.stat(synonym_table_file)
+        return f'table:{table_stat.st_size}:{table_stat.st_mtime_ns}'
+
+    return f'nltk:{nltk.__version__}'
+
+def get_wordnet_synonyms(word):
+    from nltk.corpus import wordnet
 
-def get_synonyms(word):
-    if word in synonyms_cache:
-        return synonyms_cache[word]
-    
     synonyms = set()  # Usamos um set para evitar duplicatas
     for synset in wordnet.synsets(word):
         for lemma in synset.lemmas():
             synonyms.add(lemma.name())  # Adiciona o nome do sinônimo
     synonyms.discard(word)  # Remove a própria palavra da lista
-    synonyms_cache[word] = synonyms
-    return synonyms
\ No newline at end of file
+    return synonyms
+
+@lru_cache(maxsize=1 << 16)
+def get_synonyms(word):
+    table = get_synonym_table()
+
+    if table is not None:
+        return table.get_synonyms(word)
+
+    return get_wordnet_synonyms(word)
+
+if __name__ == '__main__':
+    print("Gerando tabela de sinônimos do WordNet, aguarde...")
+    start_time = time.time()
+
+    size = build_synonym_table()
+
+    print(f"Tabela com {size} termos gerada em {synonym_table_file} ({time.time() - start_time:.4f}s)")
@@ -0,0 +1,139 @@
+import csv
+import heapq
+import json
+
+import numpy as np
+
+class ExtremeTerms:
+    """
+    The n most and n least frequent terms of a stream of (term, count)
+    pairs, kept in two heaps of n entries while counts() passes the counts
+    on (e.g. to np.fromiter), so the vocabulary is never held as a list.
+    Both lists are most frequent first, ties in stream order.
+    """
+
+    def __init__(self, n=30):
+        self.n = n
+        # heaps de mínimo: a raiz é o termo que sai quando chega um melhor
+        self.most = []
+        self.least = []
+
+    def push(self, heap, entry):
+        if len(heap) < self.n:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    def counts(self, items):
+        for idx, (term, count) in enumerate(items):
+            self.push(self.most, (count, -idx, term))
+            self.push(self.least, (-count, -idx, term))
+            yield count
+
+    def most_common(self):
+        return [(term, count) for count, _, term in sorted(self.most, key=lambda entry: (-entry[0], -entry[1]))]
+
+    def least_common(self):
+        return [(term, -count) for count, _, term in sorted(self.least, key=lambda entry: (entry[0], -entry[1]))]
+
+def rank_frequency(counts):
+    """
+    Frequencies sorted by rank (descending), as float64 for the fits.
+    """
+    return np.sort(np.asarray(counts, dtype=np.float64))[::-1]
+
+def log_spaced(frequencies, points=1000):
+    """
+    (ranks, frequencies) at about points log-spaced ranks, which is all a
+    log-log plot or fit can show of millions of ranks.
+    """
+    if not len(frequencies):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    ranks = np.unique(np.geomspace(1, len(frequencies), min(points, len(frequencies))).astype(np.int64))
+
+    return ranks, frequencies[ranks - 1]
+
+def power_law_fit(x, y):
+    """
+    Least-squares fit of y = constant * x ** exponent on log-log axes, with its
+    coefficient of determination.
+    """
+    selected = (x > 0) & (y > 0)
+
+    if selected.sum() < 2:
+        return None
+
+    log_x, log_y = np.log(x[selected]), np.log(y[selected])
+    exponent, intercept = np.polyfit(log_x, log_y, 1)
+    residual = log_y - (exponent * log_x + intercept)
+    total = ((log_y - log_y.mean()) ** 2).sum()
+
+    return {"exponent": float(exponent), "constant": float(np.exp(intercept)), "r2": float(1 - (residual ** 2).sum() / total) if total else 1.0}
+
+def zipf_fit(frequencies, points=1000):
+    """
+    Zipf's law f(r) = C / r ** s fitted on log-spaced ranks, so the long tail
+    of rare words does not outweigh the head. Returns s as "exponent".
+    """
+    ranks, sampled = log_spaced(frequencies, points)
+    fit = power_law_fit(ranks.astype(np.float64), sampled)
+
+    if fit is not None:
+        fit["exponent"] = -fit["exponent"]
+
+    return fit
+
+def heaps_fit(tokens, vocabulary, points=1000):
+    """
+    Heaps' law V(n) = K * n ** beta fitted on the vocabulary growth curve
+    (words and distinct words after each document), log-spaced like
+    zipf_fit. The fit records how many documents the curve covers.
+    """
+    tokens = np.asarray(tokens, dtype=np.float64)
+    vocabulary = np.asarray(vocabulary, dtype=np.float64)
+
+    if not len(tokens):
+        return None
+
+    idx = np.unique(np.geomspace(1, len(tokens), min(points, len(tokens))).astype(np.int64)) - 1
+    fit = power_law_fit(tokens[idx], vocabulary[idx])
+
+    if fit is not None:
+        fit["documents"] = len(tokens)
+
+    return fit
+
+def frequency_stats(items, n=30, points=1000, growth=None):
+    """
+    Everything the reports, plots and exports need from the (term, count)
+    pairs of a corpus, read in one pass: totals, the n most and least
+    frequent terms, the log-spaced rank-frequency curve and the Zipf (and,
+    given the vocabulary growth curve, Heaps) fits. Only the counts are
+    kept in memory, as a uint64 array.
+    """
+    extremes = ExtremeTerms(n)
+    counts = np.fromiter(extremes.counts(items), dtype=np.uint64)
+    frequencies = rank_frequency(counts)
+    ranks, sampled = log_spaced(frequencies, points)
+
+    return {
+        "total": int(counts.sum()),
+        "vocabulary_size": len(counts),
+        "hapax_legomena": int((counts == 1).sum()),
+        "most_common": extremes.most_common(),
+        "least_common": extremes.least_common(),
+        "rank_frequency": {"ranks": ranks.tolist(), "frequencies": sampled.astype(np.int64).tolist()},
+        "zipf": zipf_fit(frequencies, points),
+        "heaps": heaps_fit(*growth, points) if growth is not None else None
+    }
+
+def write_stats_json(path, stats):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+
+def write_rank_frequency_csv(path, stats):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "frequency"])
+        writer.writerows(zip(stats["rank_frequency"]["ranks"], stats["rank_frequency"]["frequencies"]))